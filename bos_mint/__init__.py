@@ -4,7 +4,7 @@ import pprint
 import logging
 import pkg_resources
 
-from flask import Flask, jsonify, redirect, url_for, flash
+from flask import Flask, jsonify, redirect, url_for, flash, g, request
 from flask_sqlalchemy import SQLAlchemy
 from logging.handlers import TimedRotatingFileHandler
 from werkzeug.exceptions import HTTPException, InternalServerError
@@ -312,6 +312,28 @@ def before_first_request():
     except Exception as e:
         app.logger.warning(str(e))
 
+    from .chain_listener import ChainListener
+    ChainListener().start()
+
+    from .menu_info import MENU_REFRESHER
+    MENU_REFRESHER.start()
+
+    from .dataproxy_link.ping import PING_JOB
+    PING_JOB.start()
+
+    if Config.get("advanced_features", False) and Config.get("witnesses", None):
+        from .beacons import BEACON_JOB
+        BEACON_JOB.start()
+
+
+@app.after_request
+def count_chain_lookups(response):
+    lookups = g.get("chainLookups", 0)
+    app.logger.debug("{} {} needed {} chain lookups".format(request.method, request.path, lookups))
+    if app.debug:
+        response.headers["X-Chain-Lookups"] = str(lookups)
+    return response
+
 
 @app.teardown_appcontext
 def shutdown_session(exception=None):
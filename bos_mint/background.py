@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+import threading
+
+from . import Config
+from .shared_cache import SharedCache
+
+# key of the lock in the shared cache
+LEADER_KEY = "background.leader"
+
+
+def isLeader():
+    """ Jobs that write shared state run in one worker process only. The
+        first process to ask becomes the leader and stays it as long as it
+        keeps asking within ``background.leader_ttl_in_seconds``
+    """
+    return SharedCache().acquire(
+        LEADER_KEY, os.getpid(), Config.get("background", "leader_ttl_in_seconds", 30))
+
+
+class PeriodicJob(object):
+    """ Calls ``func`` every ``interval`` seconds in a daemon thread, or
+        earlier when triggered
+
+        :param name: name of the thread
+        :type name: str
+        :param interval: function returning the interval in seconds
+        :type interval: function
+        :param func: the job
+        :type func: function
+        :param initializer: called once within the thread before the first run
+        :type initializer: function
+        :param leaderOnly: runs are skipped unless this process is the
+            leader, see isLeader
+        :type leaderOnly: bool
+    """
+
+    def __init__(self, name, interval, func, initializer=None, leaderOnly=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.initializer = initializer
+        self.leaderOnly = leaderOnly
+        self.thread = None
+        self.lastRun = 0
+        self.lastDuration = None
+        self.lastError = None
+        self._wakeUp = threading.Event()
+        self._lock = threading.Lock()
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.isRunning():
+                return
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def trigger(self):
+        """ Runs the job as soon as possible """
+        self._wakeUp.set()
+
+    def runNow(self):
+        start = time.time()
+        try:
+            if self.leaderOnly and not isLeader():
+                return
+            self.func()
+            self.lastError = None
+        except Exception as ex:
+            self.lastError = str(ex)
+            logging.getLogger(__name__).warning(
+                "Background job " + self.name + " failed: " + str(ex))
+        self.lastRun = time.time()
+        self.lastDuration = self.lastRun - start
+
+    def _run(self):
+        if self.initializer is not None:
+            self.initializer()
+        while True:
+            self._wakeUp.clear()
+            self.runNow()
+            self._wakeUp.wait(self.interval())
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "running": self.isRunning(),
+            "last_run": self.lastRun,
+            "last_duration": self.lastDuration,
+            "last_error": self.lastError
+        }
@@ -0,0 +1,108 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Config
+from .background import PeriodicJob
+from .http_client import HttpClient
+from .shared_cache import SharedCache
+from .witness_health import WitnessHealth
+
+# keys in the shared cache
+BEACON_RESPONSES = "witnesses.beacons"
+LAST_POLL = "witnesses.last_poll"
+
+
+class BeaconPoller(object):
+    """ Polls the ``/isalive`` beacons of all configured witnesses
+        concurrently. The latest result per witness is stored in the shared
+        cache, so that the witnesses view doesn't need to wait for them
+    """
+
+    def getWitnesses(self):
+        return Config.get("witnesses", []) or []
+
+    def getResponses(self):
+        """ :returns: dict of witness name to dict with ``response`` (json
+            body of the beacon or error message) and ``time``
+        """
+        responses = SharedCache().get(BEACON_RESPONSES)
+        if responses is None:
+            responses = self.poll()
+        return responses
+
+    async def _pollBeacon(self, loop, executor, url):
+        response = None
+        for attempt in range(Config.get("beacons", "attempts", 2)):
+            if attempt > 0:
+                await asyncio.sleep(0.2)
+            try:
+                response = await loop.run_in_executor(executor, HttpClient().get, url)
+                if response.status_code == 200 and response.json() is not None:
+                    return response.json()
+            except Exception as e:
+                response = e
+        if isinstance(response, Exception):
+            return "Errored, " + str(response)
+        return "HTTP response " + str(response.status_code)
+
+    async def _pollAll(self, loop, executor, witnesses):
+        deadline = Config.get("beacons", "deadline_in_seconds", 15)
+        tasks = {
+            witness["name"]: loop.create_task(
+                self._pollBeacon(loop, executor, witness["url"] + "/isalive"))
+            for witness in witnesses
+        }
+        done, pending = await asyncio.wait(list(tasks.values()), timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        responses = {}
+        for name, task in tasks.items():
+            if task in done:
+                responses[name] = {"response": task.result(), "time": time.time()}
+            else:
+                responses[name] = {
+                    "response": "Errored, no response within " + str(deadline) + "s",
+                    "time": time.time()
+                }
+        return responses
+
+    def pollIfOutdated(self):
+        """ Another worker process might have polled already """
+        interval = Config.get("beacons", "poll_interval_in_seconds", 60)
+        lastPoll = SharedCache().get(LAST_POLL)
+        if lastPoll is None or time.time() - lastPoll >= interval / 2:
+            self.poll()
+
+    def poll(self):
+        witnesses = self.getWitnesses()
+        if not witnesses:
+            return {}
+
+        executor = ThreadPoolExecutor(max_workers=min(len(witnesses), 32))
+        loop = asyncio.new_event_loop()
+        try:
+            responses = loop.run_until_complete(self._pollAll(loop, executor, witnesses))
+        finally:
+            # the cancelled tasks need to finish before the loop is closed
+            pending = asyncio.all_tasks(loop)
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+            # requests beyond the deadline finish in the background
+            executor.shutdown(wait=False)
+
+        SharedCache().set(BEACON_RESPONSES, responses)
+        SharedCache().set(LAST_POLL, time.time())
+        WitnessHealth().record(responses)
+        return responses
+
+
+#: Polls the beacons in the background, only if witnesses are configured
+BEACON_JOB = PeriodicJob(
+    "bos-mint-beacon-poller",
+    lambda: Config.get("beacons", "poll_interval_in_seconds", 60),
+    lambda: BeaconPoller().pollIfOutdated(),
+    leaderOnly=True
+)
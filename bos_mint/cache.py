@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ObjectCache(object):
+    """ Thread safe least-recently-used cache. Entries expire after
+        ``ttl`` seconds and the oldest entries are evicted once more than
+        ``max_size`` are stored.
+
+        :param max_size: maximum number of stored entries
+        :type max_size: int
+        :param ttl: time to live of an entry in seconds, 0 disables expiry
+        :type ttl: int
+    """
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                stored, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self.ttl and time.time() - stored > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """ Removes the given key, or everything if no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def invalidateWhere(self, predicate):
+        """ Removes all entries for which ``predicate(key, value)`` is true
+
+            :returns: list of the removed (key, value) tuples
+        """
+        with self._lock:
+            removed = [(key, value) for key, (stored, value) in self._data.items()
+                       if predicate(key, value)]
+            for key, value in removed:
+                del self._data[key]
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+_MISSING = object()
@@ -0,0 +1,148 @@
+import re
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import Config
+from .node import Node, initWorkerConnection
+from .http_client import HttpClient
+from .shared_cache import SharedCache
+from .dataproxy_link.ping import Ping
+
+# prefix of the job keys in the shared cache
+JOB_KEY = "cancel.job."
+
+
+def getEnglishName(obj):
+    return [x[1] for x in obj["name"] if x[0] == 'en'][0]
+
+
+def getIdString(event, eventGroup, sport):
+    """ Builds the id_string the dataproxies use for the event """
+    teams = getEnglishName(event)
+    if " v " in teams:
+        teams = teams.split(" v ")
+    if " @ " in teams:
+        teams = teams.split(" @ ")
+        teams = [teams[1], teams[0]]
+
+    return event["start_time"] + "Z" \
+        + '__' + getEnglishName(sport) \
+        + '__' + getEnglishName(eventGroup) \
+        + '__' + teams[0] \
+        + '__' + teams[1]
+
+
+class CancelJob(object):
+    """ Manufactures cancel incidents for events on all dataproxies in the
+        background. The state of every job is kept in the shared cache, so
+        that any worker process can report it
+    """
+
+    executor = None
+    executorLock = threading.Lock()
+
+    def getExecutor(self):
+        with CancelJob.executorLock:
+            if CancelJob.executor is None:
+                CancelJob.executor = ThreadPoolExecutor(
+                    max_workers=Config.get("cancel", "max_jobs", 2),
+                    initializer=initWorkerConnection)
+            return CancelJob.executor
+
+    def get(self, jobId):
+        return SharedCache().get(JOB_KEY + jobId)
+
+    def _store(self, job):
+        SharedCache().set(JOB_KEY + job["id"], job, Config.get("cancel", "job_ttl_in_seconds", 86400))
+
+    def start(self, eventIds, send=False):
+        """ :returns: id of the queued job """
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "event_ids": eventIds,
+            "send": send,
+            "created": time.time(),
+            "finished": None,
+            "progress": {"done": 0, "total": None},
+            "urls_to_call": [],
+            "responses": [],
+            "errors": []
+        }
+        self._store(job)
+        self.getExecutor().submit(self.run, job)
+        return job["id"]
+
+    def getUrls(self, job):
+        """ Resolves all events, event groups and sports with one request
+            per level and builds the distinct urls to call
+        """
+        node = Node()
+        events = node.getObjects(set(job["event_ids"]))
+        eventGroups = node.getObjects(set(x["event_group_id"] for x in events.values()))
+        sports = node.getObjects(set(x["sport_id"] for x in eventGroups.values()))
+
+        proxies = Ping().get_status()
+        if not proxies:
+            job["errors"].append(
+                "No dataproxy status known yet, either no dataproxy is configured or the first ping didn't finish")
+        urls = []
+        for eventId in job["event_ids"]:
+            try:
+                event = events[eventId]
+                eventGroup = eventGroups[event["event_group_id"]]
+                idString = getIdString(event, eventGroup, sports[eventGroup["sport_id"]])
+            except (KeyError, IndexError) as ex:
+                job["errors"].append(eventId + ": could not be resolved, " + str(ex))
+                continue
+
+            for value in proxies.values():
+                url = value["replay"] + "&manufacture=" + idString + "__canceled__None"
+                if job["send"]:
+                    url = re.sub('&only_report=True', '', url)
+                if url not in urls:
+                    urls.append(url)
+        return urls
+
+    def callUrl(self, url):
+        response = HttpClient().get(url, read_timeout=Config.get("cancel", "read_timeout_in_seconds", 1000))
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def run(self, job):
+        try:
+            job["status"] = "running"
+            self._store(job)
+
+            urls = self.getUrls(job)
+            if not urls and job["errors"]:
+                raise Exception("Nothing to call")
+            job["urls_to_call"] = urls
+            job["progress"]["total"] = len(urls)
+            self._store(job)
+
+            if urls:
+                maxWorkers = min(len(urls), Config.get("cancel", "max_workers", 8))
+                with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+                    futures = {executor.submit(self.callUrl, url): url for url in urls}
+                    for future in as_completed(futures):
+                        try:
+                            response = future.result()
+                            if response is not None:
+                                job["responses"].append(response)
+                        except Exception as ex:
+                            job["errors"].append(futures[future] + ": " + str(ex))
+                        job["progress"]["done"] += 1
+                        self._store(job)
+
+            job["status"] = "done"
+        except Exception as ex:
+            logging.getLogger(__name__).warning("Cancel job " + job["id"] + " failed: " + str(ex))
+            job["status"] = "failed"
+            job["errors"].append(str(ex))
+        job["finished"] = time.time()
+        self._store(job)
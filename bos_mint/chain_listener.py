@@ -0,0 +1,258 @@
+import time
+import logging
+import threading
+
+from peerplays.notify import Notify
+from peerplays.peerplays import PeerPlays
+
+from . import Config, datestring
+
+#: object spaces of proposals and the sport hierarchy
+OBJECT_TYPES = {
+    "1.10": "proposal",
+    "1.20": "sport",
+    "1.21": "eventgroup",
+    "1.22": "event",
+    "1.23": "bettingmarketgrouprule",
+    "1.24": "bettingmarketgroup",
+    "1.25": "bettingmarket",
+}
+
+# field that references the parent object
+PARENT_FIELD = {
+    "eventgroup": "sport_id",
+    "event": "event_group_id",
+    "bettingmarketgroup": "event_id",
+    "bettingmarket": "group_id",
+}
+
+# which type is below a type
+CHILD_TYPE = {
+    "sport": "eventgroup",
+    "eventgroup": "event",
+    "event": "bettingmarketgroup",
+    "bettingmarketgroup": "bettingmarket",
+}
+
+#: callbacks that receive (eventType, payload) for every published event
+SUBSCRIBERS = []
+
+
+def subscribe(callback):
+    """ Registers a callback that is called with ``(eventType, payload)``
+        for every published event. Event types are
+
+        * ``block``: payload contains ``block_num``, ``block`` and ``gap``
+          (blocks have been missed in between)
+        * ``object``: payload contains ``id``, ``typeName`` and ``parentId``
+          of a changed object
+        * ``reset``: any object might have changed, e.g. by a proposal whose
+          operations are unknown
+    """
+    if callback not in SUBSCRIBERS:
+        SUBSCRIBERS.append(callback)
+
+
+def publish(eventType, payload):
+    for callback in list(SUBSCRIBERS):
+        try:
+            callback(eventType, payload)
+        except Exception as ex:
+            logging.getLogger(__name__).exception(ex)
+
+
+def getObjectType(identifier):
+    return OBJECT_TYPES.get(".".join(identifier.split(".")[0:2]))
+
+
+def getChainTime(value):
+    """ Parses a time as sent by the chain, None if missing or invalid """
+    if not value:
+        return None
+    try:
+        return datestring.string_to_date(value)
+    except Exception:
+        return None
+
+
+class ChainListener(object):
+    """ Background subscriber on the node websocket. New blocks and changed
+        objects are published as invalidation events, see subscribe
+    """
+
+    thread = None
+    instance = None
+    lastBlockNumber = None
+    lastBlockTime = 0
+    #: proposal id to affected objects, expiration and review period of
+    #: open proposals
+    proposals = {}
+
+    def enabled(self):
+        return Config.get("chain_listener", "enabled", True)
+
+    def isReceiving(self):
+        """ True if blocks came in recently, only then subscribers can rely
+            on the published events
+        """
+        return ChainListener.thread is not None and\
+            time.time() - ChainListener.lastBlockTime < Config.get("chain_listener", "stale_after_seconds", 10)
+
+    def start(self):
+        if not self.enabled() or\
+                (ChainListener.thread is not None and ChainListener.thread.is_alive()):
+            return
+        ChainListener.thread = threading.Thread(
+            target=self._listen,
+            name="bos-mint-chain-listener",
+            daemon=True
+        )
+        ChainListener.thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                use = Config.get("connection", "use")
+                # separate connection for lookups from within the callbacks
+                ChainListener.instance = PeerPlays(**Config.get("connection", use))
+                self.trackOpenProposals()
+                notify = Notify(
+                    objects=[x + ".x" for x in OBJECT_TYPES.keys()],
+                    on_block=self.onBlock,
+                    on_object=self.onObject,
+                    peerplays_instance=ChainListener.instance
+                )
+                notify.listen()
+            except Exception as ex:
+                logging.getLogger(__name__).warning("Chain listener lost connection: " + str(ex))
+            time.sleep(Config.get("chain_listener", "reconnect_delay_in_seconds", 10))
+
+    def trackOpenProposals(self):
+        """ Remembers what the open proposals change, they are only
+            published once executed
+        """
+        from .hierarchy_index import getAffectedObjects
+
+        try:
+            proposals = ChainListener.instance.rpc.get_proposed_transactions("1.2.1")
+        except Exception as ex:
+            logging.getLogger(__name__).warning("Open proposals could not be loaded: " + str(ex))
+            return
+        ChainListener.proposals = {}
+        for proposal in proposals:
+            affected = []
+            for operation in proposal["proposed_transaction"]["operations"]:
+                affected.extend(getAffectedObjects(operation))
+            if affected:
+                ChainListener.proposals[proposal["id"]] = {
+                    "affected": affected,
+                    "expiration": getChainTime(proposal.get("expiration_time")),
+                    "review": proposal.get("review_period_time") is not None
+                }
+
+    def publishAffected(self, affected):
+        for typeName, identifier, parentId in affected:
+            publish("object", {
+                "id": identifier,
+                "typeName": typeName,
+                "parentId": parentId
+            })
+
+    def onProposalUpdate(self, proposalId):
+        """ An approval might have executed the proposal """
+        proposal = ChainListener.proposals.get(proposalId)
+        try:
+            executed = ChainListener.instance.rpc.get_objects([proposalId])[0] is None
+        except Exception:
+            executed = True
+
+        if proposal is not None:
+            self.publishAffected(proposal["affected"])
+            if executed:
+                del ChainListener.proposals[proposalId]
+        elif executed:
+            # created before the listener started, the operations are gone
+            publish("reset", {"proposal": proposalId})
+
+    def onBlock(self, blockId):
+        from .hierarchy_index import getAffectedObjects, getOperationName
+
+        blockNumber = int(blockId[0:8], 16)
+        maxCatchUp = Config.get("chain_listener", "max_catch_up_blocks", 100)
+
+        gap = False
+        firstBlockNumber = blockNumber
+        if ChainListener.lastBlockNumber is not None and blockNumber > ChainListener.lastBlockNumber:
+            firstBlockNumber = ChainListener.lastBlockNumber + 1
+            if blockNumber - firstBlockNumber >= maxCatchUp:
+                gap = True
+                firstBlockNumber = blockNumber
+
+        for number in range(firstBlockNumber, blockNumber + 1):
+            block = ChainListener.instance.rpc.get_block(number)
+            if not block:
+                continue
+
+            ChainListener.lastBlockNumber = number
+            ChainListener.lastBlockTime = time.time()
+            if gap:
+                # proposals might have been created in the missed blocks
+                self.trackOpenProposals()
+            publish("block", {"block_num": number, "block": block, "gap": gap})
+            gap = False
+
+            for transaction in block.get("transactions", []):
+                results = transaction.get("operation_results", [])
+                for idx, operation in enumerate(transaction.get("operations", [])):
+                    operationName = getOperationName(operation[0])
+                    if operationName == "proposal_create":
+                        # nothing changes before the proposal is executed
+                        affected = getAffectedObjects(operation)
+                        if affected and idx < len(results):
+                            ChainListener.proposals[results[idx][1]] = {
+                                "affected": affected,
+                                "expiration": getChainTime(operation[1].get("expiration_time")),
+                                "review": operation[1].get("review_period_seconds") is not None
+                            }
+                    elif operationName == "proposal_update":
+                        self.onProposalUpdate(operation[1]["proposal"])
+                    elif operationName == "proposal_delete":
+                        ChainListener.proposals.pop(operation[1]["proposal"], None)
+                    else:
+                        self.publishAffected(getAffectedObjects(operation))
+
+            blockTime = getChainTime(block.get("timestamp"))
+            if blockTime is not None:
+                self.onBlockTime(blockTime)
+
+    def onBlockTime(self, blockTime):
+        """ Proposals with a review period are executed on expiration if
+            approved, all others lapse
+        """
+        expired = [
+            proposalId for proposalId, proposal in ChainListener.proposals.items()
+            if proposal["expiration"] is not None and proposal["expiration"] <= blockTime
+        ]
+        if not expired:
+            return
+        try:
+            remaining = ChainListener.instance.rpc.get_objects(expired)
+        except Exception as ex:
+            # checked again with the next block
+            logging.getLogger(__name__).warning("Expired proposals could not be checked: " + str(ex))
+            return
+
+        for proposalId, chainProposal in zip(expired, remaining):
+            if chainProposal is not None:
+                continue
+            proposal = ChainListener.proposals.pop(proposalId)
+            if proposal["review"]:
+                self.publishAffected(proposal["affected"])
+
+    def onObject(self, notice):
+        typeName = getObjectType(notice["id"])
+        publish("object", {
+            "id": notice["id"],
+            "typeName": typeName,
+            "parentId": notice.get(PARENT_FIELD.get(typeName))
+        })
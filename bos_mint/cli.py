@@ -15,5 +15,17 @@ def start(port, host):
     app.run(debug=Config.get("debug"), port=port, host=host)
 
 
+@main.command()
+def index():
+    """ (Re)builds the local hierarchy index
+    """
+    from bos_mint import db
+    from bos_mint.web import app
+    from bos_mint.hierarchy_index import HierarchyIndex
+    with app.app_context():
+        db.create_all()
+        HierarchyIndex().bootstrap()
+
+
 if __name__ == "__main__":
     main()
@@ -1,5 +1,5 @@
 from bos_mint import Config
-import requests
+from bos_mint.http_client import HttpClient
 
 
 def get_replayable_incidents(filter, identifier, chain, target=None):
@@ -13,7 +13,7 @@ def get_replayable_incidents(filter, identifier, chain, target=None):
     )
     if target is not None and not target == "All":
         replay_url = replay_url + "&target=" + target
-    response = requests.get(replay_url, timeout=10)
+    response = HttpClient().get(replay_url)
     if not response.status_code == 200:
         raise Exception("Dataproxy appears down, status=" + str(response.status_code))
     json_response = response.json()
@@ -35,7 +35,7 @@ def replay_incidents(filter, identifier, chain, target=None):
     )
     if target is not None and not target == "All":
         replay_url = replay_url + "&target=" + target
-    response = requests.get(replay_url, timeout=10)
+    response = HttpClient().get(replay_url)
     if not response.status_code == 200:
         raise Exception("Dataproxy appears down, status=" + str(response.status_code))
     json_response = response.json()
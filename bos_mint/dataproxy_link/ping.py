@@ -1,62 +1,86 @@
 from .. import Config
+from ..background import PeriodicJob
+from ..http_client import HttpClient
+from ..shared_cache import SharedCache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import requests
 
 
 class Ping(object):
+    """ Health of the configured dataproxies. The proxies are pinged by
+        PING_JOB in the background, views only read the cached status
+    """
 
-    CACHE = {}
-    LAST_PING = None
-
-    def __init__(self):
-        self.ensure_ping()
+    # keys in the shared cache, all worker processes use the same status
+    CACHE = "dataproxy_link.status"
+    LAST_PING = "dataproxy_link.last_ping"
 
     def ensure_ping(self):
         ping_interval_in_seconds = Config.get("dataproxy_link", "ping_interval_in_seconds", 300)
-        if Ping.LAST_PING is None or datetime.utcnow() > Ping.LAST_PING + timedelta(ping_interval_in_seconds):
+        last_ping = SharedCache().get(Ping.LAST_PING)
+        if last_ping is None or datetime.utcnow() > datetime.utcfromtimestamp(last_ping) + timedelta(seconds=ping_interval_in_seconds):
             self.ping()
 
     def ping(self):
+        """ Pings all proxies concurrently """
         proxies = Config.get("dataproxy_link", "proxies", {})
-        for provider_hash, proxy in proxies.items():
+        status = {}
+        if proxies:
+            with ThreadPoolExecutor(max_workers=len(proxies)) as executor:
+                for provider_hash, proxy_status in zip(
+                        proxies.keys(),
+                        executor.map(self.ping_proxy, proxies.values())):
+                    if proxy_status is not None:
+                        status[provider_hash] = proxy_status
+        SharedCache().set(Ping.CACHE, status)
+        SharedCache().set(Ping.LAST_PING, (datetime.utcnow() - datetime(1970, 1, 1)).total_seconds())
+
+    def ping_proxy(self, proxy):
+        timeout = Config.get("dataproxy_link", "ping_timeout_in_seconds", 5)
+        try:
+            isalive_url = proxy["endpoint"] + "/isalive?token=" + proxy["token"]
+            replay_url = proxy["endpoint"] + "/replay?token=" + proxy["token"] + "&only_report=True&restrict_witness_group=" + Config.get("connection", "use")
             try:
-                isalive_url = proxy["endpoint"] + "/isalive?token=" + proxy["token"]
-                replay_url = proxy["endpoint"] + "/replay?token=" + proxy["token"] + "&only_report=True&restrict_witness_group=" + Config.get("connection", "use")
-                try:
-                    response = requests.get(replay_url)
-                    if not response.status_code == 200:
-                        raise Exception("nok")
-                    response = requests.get(isalive_url)
-                    if not response.status_code == 200:
-                        raise Exception("nok")
-                    json_body = response.json()
-                    Ping.CACHE[provider_hash] = {"status": json_body["status"],
-                                                 "name": proxy.get("name", proxy["endpoint"]),
-                                                 "isalive": proxy["endpoint"] + "/isalive",
-                                                 "replay": replay_url,
-                                                 "details": json_body}
-                except Exception as e:
-                    Ping.CACHE[provider_hash] = {"status": "nok",
-                                                 "name": proxy.get("name", proxy["endpoint"]),
-                                                 "isalive": proxy["endpoint"] + "/isalive",
-                                                 "replay": replay_url}
-            except KeyError:
-                pass
+                response = HttpClient().get(replay_url, read_timeout=timeout)
+                if not response.status_code == 200:
+                    raise Exception("nok")
+                response = HttpClient().get(isalive_url, read_timeout=timeout)
+                if not response.status_code == 200:
+                    raise Exception("nok")
+                json_body = response.json()
+                return {"status": json_body["status"],
+                        "name": proxy.get("name", proxy["endpoint"]),
+                        "isalive": proxy["endpoint"] + "/isalive",
+                        "replay": replay_url,
+                        "details": json_body}
             except Exception as e:
-                pass
-        Ping.LAST_PING = datetime.utcnow()
+                return {"status": "nok",
+                        "name": proxy.get("name", proxy["endpoint"]),
+                        "isalive": proxy["endpoint"] + "/isalive",
+                        "replay": replay_url}
+        except KeyError:
+            return None
+        except Exception as e:
+            return None
 
     def get_status(self):
-        return Ping.CACHE
+        return SharedCache().get(Ping.CACHE, {})
 
-    def get_replay_url(self, provider_hash, incident, call):
-        try:
-            if Ping.CACHE.get(provider_hash, None) is not None:
-                replay_url = Ping.CACHE[provider_hash]["replay"]
-                replay_url = replay_url + "&name_filter=" + incident["unique_string"] + "," + call
-                return replay_url
-            else:
-                return None
-        except KeyError:
-            return None
-    
\ No newline at end of file
+    def get_replay_url_prefixes(self):
+        """ Replay url of every pinged proxy, only the name filter needs
+            to be appended. Read this once and reuse it for many incidents
+        """
+        prefixes = {}
+        for provider_hash, status in self.get_status().items():
+            if status is not None and status.get("replay", None) is not None:
+                prefixes[provider_hash] = status["replay"] + "&name_filter="
+        return prefixes
+
+
+#: Pings the proxies once the last ping of any worker is older than the interval
+PING_JOB = PeriodicJob(
+    "bos-mint-dataproxy-ping",
+    lambda: min(30, Config.get("dataproxy_link", "ping_interval_in_seconds", 300)),
+    lambda: Ping().ensure_ping(),
+    leaderOnly=True
+)
@@ -343,7 +343,7 @@ class NewEventForm(FlaskForm):
         if isinstance(selectedObject, EventGroup):
             sportId = selectedObject['sport_id']
         elif isinstance(selectedObject, Event):
-            sportId = selectedObject.eventgroup.sport['id']
+            sportId = Node().getEventGroup(selectedObject['event_group_id'])['sport_id']
             self.status.choices = utils.filterOnlyAllowed(EventStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.EventGroup):
             sportId = selectedObject.get('parentId')
@@ -356,7 +356,7 @@ class NewEventForm(FlaskForm):
             self.eventgroup.data = default['parentId']
 
     def fill(self, selectedObject):
-        self.eventgroup.data = selectedObject.eventgroup['id']
+        self.eventgroup.data = selectedObject['event_group_id']
         self.name.fill(selectedObject['name'])
         self.season.fill(selectedObject['season'])
 
@@ -412,7 +412,7 @@ class EventFormDetails(FlaskForm):
         if isinstance(selectedObject, EventGroup):
             sportId = selectedObject['sport_id']
         elif isinstance(selectedObject, Event):
-            sportId = selectedObject.eventgroup.sport['id']
+            sportId = Node().getEventGroup(selectedObject['event_group_id'])['sport_id']
             self.status.choices = utils.filterOnlyAllowed(EventStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.EventGroup):
             sportId = selectedObject.get('parentId')
@@ -425,7 +425,7 @@ class EventFormDetails(FlaskForm):
             self.eventgroup.data = default['parentId']
 
     def fill(self, selectedObject):
-        self.eventgroup.data = selectedObject.eventgroup['id']
+        self.eventgroup.data = selectedObject['event_group_id']
         self.name.fill(selectedObject['name'])
         self.season.fill(selectedObject['season'])
 
@@ -467,7 +467,7 @@ class EventStatusForm(FlaskForm):
         if isinstance(selectedObject, EventGroup):
             sportId = selectedObject['sport_id']
         elif isinstance(selectedObject, Event):
-            sportId = selectedObject.eventgroup.sport['id']
+            sportId = Node().getEventGroup(selectedObject['event_group_id'])['sport_id']
             self.status.choices = utils.filterOnlyAllowed(EventStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.EventGroup):
             sportId = selectedObject.get('parentId')
@@ -479,7 +479,7 @@ class EventStatusForm(FlaskForm):
             self.eventgroup.data = default['parentId']
 
     def fill(self, selectedObject):
-        self.eventgroup.data = selectedObject.eventgroup['id']
+        self.eventgroup.data = selectedObject['event_group_id']
 #         self.name.fill(selectedObject['name'])
         self.status.data = "finished"
         if selectedObject['scores']:
@@ -523,7 +523,7 @@ class NewBettingMarketGroupForm(FlaskForm):
         if isinstance(selectedObject, Event):
             eventGroupId = selectedObject['event_group_id']
         elif isinstance(selectedObject, BettingMarketGroup):
-            eventGroupId = selectedObject.event['event_group_id']
+            eventGroupId = Node().getEvent(selectedObject['event_id'])['event_group_id']
             self.status.choices = utils.filterOnlyAllowed(BettingMarketGroupStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.Event):
             eventGroupId = selectedObject.get('parentId')
@@ -598,7 +598,7 @@ class BettingMarketGroupFormDetails(FlaskForm):
         if isinstance(selectedObject, Event):
             eventGroupId = selectedObject['event_group_id']
         elif isinstance(selectedObject, BettingMarketGroup):
-            eventGroupId = selectedObject.event['event_group_id']
+            eventGroupId = Node().getEvent(selectedObject['event_id'])['event_group_id']
             self.status.choices = utils.filterOnlyAllowed(BettingMarketGroupStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.Event):
             eventGroupId = selectedObject.get('parentId')
@@ -650,7 +650,7 @@ class NewBettingMarketForm(FlaskForm):
         if isinstance(selectedObject, BettingMarketGroup):
             eventId = selectedObject['event_id']
         elif isinstance(selectedObject, BettingMarket):
-            eventId = selectedObject.bettingmarketgroup['event_id']
+            eventId = Node().getBettingMarketGroup(selectedObject['group_id'])['event_id']
             self.status.choices = utils.filterOnlyAllowed(BettingMarketStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.BettingMarketGroup):
             eventId = selectedObject.get('parentId')
@@ -710,7 +710,7 @@ class BettingMarketFormDetails(FlaskForm):
         if isinstance(selectedObject, BettingMarketGroup):
             eventId = selectedObject['event_id']
         elif isinstance(selectedObject, BettingMarket):
-            eventId = selectedObject.bettingmarketgroup['event_id']
+            eventId = Node().getBettingMarketGroup(selectedObject['group_id'])['event_id']
             self.status.choices = utils.filterOnlyAllowed(BettingMarketStatus, selectedObject['status'])
         elif isinstance(selectedObject, wrapper.BettingMarketGroup):
             eventId = selectedObject.get('parentId')
@@ -839,7 +839,7 @@ class BettingMarketGroupResolveForm(FlaskForm):
         elif isinstance(selectedObject, Event):
             eventGroupId = selectedObject['event_group_id']
         elif isinstance(selectedObject, BettingMarketGroup):
-            eventGroupId = selectedObject.event['event_group_id']
+            eventGroupId = Node().getEvent(selectedObject['event_id'])['event_group_id']
         elif isinstance(selectedObject, wrapper.Event):
             eventGroupId = selectedObject.get('parentId')
 
@@ -856,7 +856,7 @@ class BettingMarketGroupResolveForm(FlaskForm):
         elif isinstance(selectedObject, BettingMarketGroup):
             eventId = selectedObject['event_id']
         elif isinstance(selectedObject, BettingMarket):
-            eventId = selectedObject.bettingmarketgroup['event_id']
+            eventId = Node().getBettingMarketGroup(selectedObject['group_id'])['event_id']
         elif isinstance(selectedObject, wrapper.BettingMarketGroup):
             eventId = selectedObject.get('parentId')
         elif isinstance(selectedObject, Event):
@@ -0,0 +1,346 @@
+import json
+import time
+import logging
+
+from peerplays.eventgroup import EventGroup
+from peerplays.event import Event
+from peerplays.bettingmarketgroup import BettingMarketGroup
+from peerplays.bettingmarket import BettingMarket
+from peerplays.rule import Rule
+from peerplaysbase.operationids import getOperationNameForId
+
+from . import app, db, Config, wrapper, chain_listener
+from .background import isLeader
+from .chain_listener import ChainListener, CHILD_TYPE, PARENT_FIELD
+from .models import (
+    IndexedObject,
+    IndexedList,
+    IndexedProposal,
+    ViewConfiguration
+)
+from .node import Node
+
+#: operation name: (typeName, field of the object id, field of the parent id)
+OPERATIONS = {
+    'sport_create': ('sport', None, None),
+    'sport_update': ('sport', 'sport_id', None),
+    'sport_delete': ('sport', 'sport_id', None),
+    'event_group_create': ('eventgroup', None, 'sport_id'),
+    'event_group_update': ('eventgroup', 'event_group_id', 'new_sport_id'),
+    'event_group_delete': ('eventgroup', 'event_group_id', None),
+    'event_create': ('event', None, 'event_group_id'),
+    'event_update': ('event', 'event_id', 'new_event_group_id'),
+    'event_update_status': ('event', 'event_id', None),
+    'betting_market_rules_create': ('bettingmarketgrouprule', None, None),
+    'betting_market_rules_update': ('bettingmarketgrouprule', 'betting_market_rules_id', None),
+    'betting_market_group_create': ('bettingmarketgroup', None, 'event_id'),
+    'betting_market_group_update': ('bettingmarketgroup', 'betting_market_group_id', 'new_event_id'),
+    'betting_market_group_resolve': ('bettingmarketgroup', 'betting_market_group_id', None),
+    'betting_market_create': ('bettingmarket', None, 'group_id'),
+    'betting_market_update': ('bettingmarket', 'betting_market_id', 'new_group_id'),
+}
+
+# restores the object as returned by the Node getters
+TYPE_TO_OBJECT = {
+    'sport': lambda data: wrapper.Sport(**data),
+    'eventgroup': lambda data: EventGroup(data, peerplays_instance=Node().get_node()),
+    'event': lambda data: Event(data, peerplays_instance=Node().get_node()),
+    'bettingmarketgroup': lambda data: BettingMarketGroup(data, peerplays_instance=Node().get_node()),
+    'bettingmarket': lambda data: BettingMarket(data, peerplays_instance=Node().get_node()),
+    'bettingmarketgrouprule': lambda data: Rule(data, peerplays_instance=Node().get_node()),
+}
+
+# keys added by the wrapper classes, not part of the chain object
+WRAPPER_KEYS = ['typeName', 'parentId', 'toString']
+
+
+def getOperationName(operationId):
+    try:
+        return getOperationNameForId(operationId)
+    except Exception:
+        return None
+
+
+def getAffectedObjects(operation):
+    """ Lists the objects of the sport hierarchy that the given operation
+        changes, proposed operations of a proposal included
+
+        :param operation: operation as [operationId, data]
+        :type operation: list
+        :returns: list of [typeName, identifier, parentId], identifier is
+            None for creations
+    """
+    operationName = getOperationName(operation[0])
+    data = operation[1]
+
+    if operationName == 'proposal_create':
+        affected = []
+        for proposedOperation in data.get('proposed_ops', []):
+            affected.extend(getAffectedObjects(proposedOperation['op']))
+        return affected
+
+    if operationName not in OPERATIONS:
+        return []
+
+    typeName, idField, parentField = OPERATIONS[operationName]
+    return [[
+        typeName,
+        data.get(idField) if idField else None,
+        data.get(parentField) if parentField else None
+    ]]
+
+
+def isRelative(identifier):
+    return identifier is not None and identifier.startswith('0.0')
+
+
+class HierarchyIndex(object):
+    """ Local index of the sport hierarchy (sport, event group, event,
+        betting market group, betting market and rules) in the SQL database.
+
+        Lists and objects are filled on the first lookup and kept current by
+        reading the BOS operations of every new block. Every object touched
+        by an operation is dropped together with its subtree and reloaded
+        from the blockchain on the next lookup.
+    """
+
+    #: Time of the last sync of this process
+    lastSync = 0
+
+    def enabled(self):
+        return Config.get("hierarchy_index", "enabled", False)
+
+    def getAll(self, typeName, parentId, fallback):
+        """ Returns all objects of typeName below parentId
+
+            :param fallback: getter called with parentId if the list is not indexed
+            :type fallback: function
+        """
+        if not self.enabled():
+            return fallback(parentId)
+
+        self.sync()
+
+        if IndexedList.query.get((typeName, parentId or '')) is not None:
+            return [
+                json.loads(x.data) for x in
+                IndexedObject.query.filter_by(typeName=typeName, parentId=parentId or '').all()
+            ]
+
+        objects = fallback(parentId)
+        self.storeAll(typeName, parentId, objects)
+        return objects
+
+    def get(self, typeName, identifier, fallback):
+        """ Returns the object of typeName with the given identifier
+
+            :param fallback: getter called with identifier if the object is not indexed
+            :type fallback: function
+        """
+        if not self.enabled() or isRelative(identifier):
+            return fallback(identifier)
+
+        self.sync()
+
+        row = IndexedObject.query.get(identifier)
+        if row is not None and row.typeName == typeName:
+            return TYPE_TO_OBJECT[typeName](json.loads(row.data))
+
+        obj = fallback(identifier)
+        self.store(typeName, obj)
+        db.session.commit()
+        return obj
+
+    def _toRow(self, typeName, obj, parentId=None):
+        data = {key: value for key, value in dict(obj).items() if key not in WRAPPER_KEYS}
+        if parentId is None and typeName in PARENT_FIELD:
+            parentId = data.get(PARENT_FIELD[typeName])
+        return IndexedObject(
+            identifier=data['id'],
+            typeName=typeName,
+            parentId=parentId or '',
+            data=json.dumps(data, default=str)
+        )
+
+    def store(self, typeName, obj):
+        db.session.merge(self._toRow(typeName, obj))
+
+    def storeAll(self, typeName, parentId, objects):
+        for obj in objects:
+            if obj is not None:
+                db.session.merge(self._toRow(typeName, obj, parentId))
+        db.session.merge(IndexedList(typeName=typeName, parentId=parentId or ''))
+        db.session.commit()
+
+    def _dropList(self, typeName, parentId):
+        if isRelative(parentId):
+            # parent is created within the same proposal, drop all lists
+            IndexedList.query.filter_by(typeName=typeName).delete()
+        else:
+            IndexedList.query.filter_by(typeName=typeName, parentId=parentId or '').delete()
+
+    def _dropSubtree(self, typeName, identifier):
+        row = IndexedObject.query.get(identifier)
+        if row is not None:
+            self._dropList(typeName, row.parentId)
+            db.session.delete(row)
+
+        childType = CHILD_TYPE.get(typeName)
+        if childType:
+            self._dropList(childType, identifier)
+            for child in IndexedObject.query.filter_by(typeName=childType, parentId=identifier).all():
+                self._dropSubtree(childType, child.identifier)
+
+    def invalidate(self, affected):
+        """ Drops everything the given affected objects touch, see
+            getAffectedObjects
+        """
+        for typeName, identifier, parentId in affected:
+            if identifier is not None and not isRelative(identifier):
+                self._dropSubtree(typeName, identifier)
+            if identifier is None or parentId is not None:
+                # creation or relocation to a new parent
+                self._dropList(typeName, parentId)
+
+    def applyBlock(self, block, rpc):
+        """ Invalidates all indexed objects that are changed by the
+            operations within the given block
+        """
+        for transaction in block.get('transactions', []):
+            results = transaction.get('operation_results', [])
+            for idx, operation in enumerate(transaction.get('operations', [])):
+                operationName = getOperationName(operation[0])
+
+                if operationName == 'proposal_create':
+                    affected = getAffectedObjects(operation)
+                    if affected and idx < len(results):
+                        db.session.merge(IndexedProposal(
+                            proposalId=results[idx][1],
+                            affected=json.dumps(affected),
+                            expiration=operation[1].get('expiration_time')
+                        ))
+                elif operationName in ['proposal_update', 'proposal_delete']:
+                    self._proposalChanged(operation[1]['proposal'], rpc)
+                else:
+                    self.invalidate(getAffectedObjects(operation))
+
+        # proposals with a review period are executed on expiration
+        for proposal in IndexedProposal.query.filter(
+                IndexedProposal.expiration <= block.get('timestamp')).all():
+            self.invalidate(json.loads(proposal.affected))
+            db.session.delete(proposal)
+
+    def _proposalChanged(self, proposalId, rpc):
+        # an approval might have executed the proposal
+        proposal = IndexedProposal.query.get(proposalId)
+        if proposal is not None:
+            self.invalidate(json.loads(proposal.affected))
+            return
+
+        # created before the index was started
+        try:
+            chainProposal = rpc.get_objects([proposalId])[0]
+        except Exception:
+            chainProposal = None
+        if chainProposal is not None:
+            affected = []
+            for operation in chainProposal['proposed_transaction']['operations']:
+                affected.extend(getAffectedObjects(operation))
+            self.invalidate(affected)
+            if affected:
+                db.session.merge(IndexedProposal(
+                    proposalId=proposalId,
+                    affected=json.dumps(affected),
+                    expiration=chainProposal.get('expiration_time')
+                ))
+
+    def applyPublishedBlock(self, blockNumber, block):
+        """ Applies a block published by the chain listener, or syncs if
+            blocks are missing in between
+        """
+        try:
+            lastBlockNumber = ViewConfiguration.get("hierarchy_index", "last_block", None)
+            if lastBlockNumber is not None and int(lastBlockNumber) == blockNumber - 1:
+                self.applyBlock(block, ChainListener.instance.rpc)
+                ViewConfiguration.set("hierarchy_index", "last_block", str(blockNumber))
+            elif lastBlockNumber is None or int(lastBlockNumber) < blockNumber:
+                # the shared connection must not be used from this thread
+                self.sync(force=True, rpc=ChainListener.instance.rpc)
+        except Exception as ex:
+            db.session.rollback()
+            logging.getLogger(__name__).warning("Hierarchy index could not apply block: " + str(ex))
+
+    def sync(self, force=False, rpc=None):
+        """ Reads all blocks since the last sync. The index is reset if it
+            fell back too far. Not necessary while the chain listener
+            publishes new blocks
+
+            :param rpc: connection to use instead of the shared one
+        """
+        interval = Config.get("hierarchy_index", "sync_interval_in_seconds", 3)
+        if not force and (ChainListener().isReceiving() or
+                          time.time() - HierarchyIndex.lastSync < interval):
+            return
+        HierarchyIndex.lastSync = time.time()
+
+        try:
+            if rpc is None:
+                rpc = Node().get_node().rpc
+            headBlockNumber = rpc.get_object("2.1.0")["head_block_number"]
+            lastBlockNumber = ViewConfiguration.get("hierarchy_index", "last_block", None)
+
+            if lastBlockNumber is None or\
+                    headBlockNumber - int(lastBlockNumber) > Config.get("hierarchy_index", "max_blocks_per_sync", 1200):
+                self.reset()
+            else:
+                for blockNumber in range(int(lastBlockNumber) + 1, headBlockNumber + 1):
+                    block = rpc.get_block(blockNumber)
+                    if block:
+                        self.applyBlock(block, rpc)
+
+            ViewConfiguration.set("hierarchy_index", "last_block", str(headBlockNumber))
+        except Exception as ex:
+            db.session.rollback()
+            logging.getLogger(__name__).warning("Hierarchy index could not be synced: " + str(ex))
+
+    def reset(self):
+        IndexedObject.query.delete()
+        IndexedList.query.delete()
+        IndexedProposal.query.delete()
+        db.session.commit()
+
+    def bootstrap(self):
+        """ Rebuilds the index with all sports, event groups, events and
+            rules. Betting market groups and markets are indexed on first
+            lookup
+        """
+        self.reset()
+        self.sync(force=True)
+
+        node = Node()
+        executor = node.getTraversalExecutor()
+
+        sports = node.getSports()
+        self.storeAll('sport', None, sports)
+        self.storeAll('bettingmarketgrouprule', None, node.getBettingMarketGroupRules())
+
+        sportIds = [x['id'] for x in sports]
+        eventGroupIds = []
+        for sportId, eventgroups in zip(sportIds, executor.map(node.getEventGroups, sportIds)):
+            self.storeAll('eventgroup', sportId, eventgroups)
+            eventGroupIds.extend(x['id'] for x in eventgroups)
+
+        for eventGroupId, events in zip(eventGroupIds, executor.map(node.getEvents, eventGroupIds)):
+            self.storeAll('event', eventGroupId, events)
+
+
+def onChainEvent(eventType, payload):
+    """ Applies the blocks published by the chain listener
+    """
+    # every worker process listens, but only the leader writes the index
+    if eventType == "block" and HierarchyIndex().enabled() and isLeader():
+        with app.app_context():
+            HierarchyIndex().applyPublishedBlock(payload["block_num"], payload["block"])
+
+
+chain_listener.subscribe(onChainEvent)
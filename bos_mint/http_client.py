@@ -0,0 +1,74 @@
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+
+from . import Config
+
+
+class HttpClient(object):
+    """ HTTP client for dataproxies and witness beacons. Every host gets its
+        own keep-alive session, so that connections and TLS sessions are
+        reused. Requests, errors and latency are counted per host
+    """
+
+    sessions = {}
+    hostStats = {}
+    lock = threading.Lock()
+
+    def getSession(self, host):
+        with HttpClient.lock:
+            session = HttpClient.sessions.get(host)
+            if session is None:
+                poolSize = Config.get("http_client", "pool_size", 10)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                HttpClient.sessions[host] = session
+                HttpClient.hostStats[host] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "latency": None,
+                    "last_status": None
+                }
+            return session
+
+    def get(self, url, read_timeout=None, **kwargs):
+        """ Same as requests.get, with the configured connect and read
+            timeout
+        """
+        host = urlparse(url).netloc
+        session = self.getSession(host)
+        timeout = (
+            Config.get("http_client", "connect_timeout_in_seconds", 3),
+            read_timeout or Config.get("http_client", "read_timeout_in_seconds", 10)
+        )
+
+        start = time.time()
+        try:
+            response = session.get(url, timeout=timeout, **kwargs)
+        except Exception:
+            self._record(host, time.time() - start, None)
+            raise
+        self._record(host, time.time() - start, response.status_code)
+        return response
+
+    def _record(self, host, duration, statusCode):
+        smoothing = Config.get("http_client", "latency_smoothing", 0.3)
+        with HttpClient.lock:
+            stats = HttpClient.hostStats[host]
+            stats["requests"] += 1
+            stats["last_status"] = statusCode
+            if statusCode is None or statusCode >= 500:
+                stats["errors"] += 1
+            if stats["latency"] is None:
+                stats["latency"] = duration
+            else:
+                stats["latency"] = smoothing * duration + (1 - smoothing) * stats["latency"]
+
+    def stats(self):
+        with HttpClient.lock:
+            return {host: dict(stats) for host, stats in HttpClient.hostStats.items()}
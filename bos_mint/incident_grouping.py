@@ -0,0 +1,94 @@
+from bos_incidents.format import INCIDENT_CALLS, get_reconstruct_string
+
+from . import incident_store, Config
+from .cache import ObjectCache
+from .dataproxy_link.ping import Ping
+
+#: resolved and grouped incidents of an event, see getGroupingKey
+GROUPING_CACHE = ObjectCache(
+    max_size=Config.get("incidents", "grouping_cache_size", 2000),
+    ttl=Config.get("incidents", "grouping_cache_ttl_in_seconds", 600)
+)
+
+
+def getGroupingKey(event, proxyFingerprint):
+    """ The grouping of an event only changes when incidents are added """
+    counts = []
+    for call in INCIDENT_CALLS:
+        callDict = event.get(call, None)
+        if callDict is None or callDict.get("incidents", None) is None:
+            counts.append(None)
+        else:
+            counts.append(len(callDict["incidents"]))
+    return (event["id_string"], tuple(counts), proxyFingerprint)
+
+
+def groupIncidents(event, replayUrlPrefixes):
+    """ Sorts the incidents of a resolved event per provider and adds the
+        reconstruct string
+
+        :param replayUrlPrefixes: see Ping.get_replay_url_prefixes
+
+        :returns: dict with the grouped calls and the reconstruct string
+    """
+    grouping = {"id": event.get("id", None), "calls": {}}
+    for call in INCIDENT_CALLS:
+        try:
+            incidentsPerProvider = {}
+            for incident in event[call]["incidents"]:
+                provider = incident["provider_info"]["name"]
+                if provider not in incidentsPerProvider:
+                    incidentsPerProvider[provider] = {"incidents": [], "replay_links": {}}
+                incidentsPerProvider[provider]["incidents"].append(incident)
+
+                if provider in replayUrlPrefixes:
+                    incidentsPerProvider[provider]["replay_links"][incident["unique_string"]] = \
+                        replayUrlPrefixes[provider] + incident["unique_string"] + "," + call
+
+            grouping["calls"][call] = {
+                "incidents": event[call]["incidents"],
+                "incidents_per_provider": incidentsPerProvider
+            }
+        except KeyError:
+            pass
+    grouping["reconstruct_string"] = get_reconstruct_string(event["id"])
+    return grouping
+
+
+def applyGrouping(event, grouping):
+    if event.get("id", None) is None and grouping["id"] is not None:
+        event["id"] = grouping["id"]
+    for call, callGrouping in grouping["calls"].items():
+        event[call]["incidents"] = callGrouping["incidents"]
+        event[call]["incidents_per_provider"] = callGrouping["incidents_per_provider"]
+    event["reconstruct_string"] = grouping["reconstruct_string"]
+    return event
+
+
+def iterGroupedEvents(store, pages):
+    """ Resolves the events and sorts their incidents per provider, events
+        are yielded one by one. Only events with new incidents are resolved,
+        the others are taken from the cache
+    """
+    # the dataproxy status is read once, the replay links depend on it
+    replayUrlPrefixes = Ping().get_replay_url_prefixes()
+    proxyFingerprint = tuple(sorted(replayUrlPrefixes.items()))
+    for unresolvedEvents in pages:
+        groupings = {}
+        missing = []
+        for event in unresolvedEvents:
+            grouping = GROUPING_CACHE.get(getGroupingKey(event, proxyFingerprint))
+            if grouping is None:
+                missing.append(event)
+            else:
+                groupings[event["id_string"]] = grouping
+
+        # the incidents of all missing events are loaded at once
+        keys = {x["id_string"]: getGroupingKey(x, proxyFingerprint) for x in missing}
+        for event in incident_store.resolveEvents(store, missing):
+            grouping = groupIncidents(event, replayUrlPrefixes)
+            GROUPING_CACHE.set(keys[event["id_string"]], grouping)
+            groupings[event["id_string"]] = grouping
+
+        for event in unresolvedEvents:
+            yield applyGrouping(event, groupings[event["id_string"]])
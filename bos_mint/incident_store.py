@@ -0,0 +1,255 @@
+import re
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+from pymongo.errors import PyMongoError
+from strict_rfc3339 import InvalidRFC3339Error
+from bos_incidents.format import INCIDENT_CALLS, id_to_string
+from bos_incidents.exceptions import EventNotFoundException
+
+from . import datestring, Config
+from .cache import ObjectCache
+
+#: collections whose indexes have been ensured by this process
+INDEXED_COLLECTIONS = set()
+
+#: latest ETag of the incidents of a call, see getCallETag
+ETAG_CACHE = ObjectCache(
+    max_size=Config.get("incidents", "etag_cache_size", 1000),
+    ttl=Config.get("incidents", "etag_ttl_in_seconds", 10)
+)
+
+#: scheduled time at the start of an id_string, with or without colons
+SCHEDULED_TIME = re.compile(r"^(\d{4})-(\d{2})-(\d{2})t(\d{2}):?(\d{2}):?(\d{2})", re.IGNORECASE)
+
+
+def getScheduledTime(idString):
+    """ The id_string of an event starts with its scheduled start time """
+    match = SCHEDULED_TIME.match(idString)
+    if match is not None:
+        return datetime(*[int(x) for x in match.groups()], tzinfo=timezone.utc)
+    try:
+        return datestring.string_to_date(idString[0:18])
+    except InvalidRFC3339Error:
+        try:
+            return datestring.string_to_date(idString[0:20])
+        except InvalidRFC3339Error:
+            return datestring.string_to_date(idString[0:23])
+
+
+class ScheduledTimes(object):
+    """ Scheduled time of every id_string seen by this process, so that
+        every id_string is parsed only once
+    """
+
+    scheduled = {}
+    lock = threading.Lock()
+
+    def get(self, idString):
+        scheduled = ScheduledTimes.scheduled.get(idString)
+        if scheduled is None:
+            scheduled = getScheduledTime(idString)
+            with ScheduledTimes.lock:
+                if len(ScheduledTimes.scheduled) >= Config.get("incidents", "max_scheduled_times", 100000):
+                    ScheduledTimes.scheduled.clear()
+                ScheduledTimes.scheduled[idString] = scheduled
+        return scheduled
+
+
+def filterByScheduledTime(events, fromDate=None, toDate=None):
+    """ Keeps the events scheduled within the window, both ends included """
+    scheduledTimes = ScheduledTimes()
+    return [
+        event for event in events
+        if (fromDate is None or scheduledTimes.get(event["id_string"]) >= fromDate) and
+        (toDate is None or scheduledTimes.get(event["id_string"]) <= toDate)
+    ]
+
+
+def getEventFilter(fromDate=None, toDate=None, matching=None):
+    """ Translates the date window and the matching terms into a query on
+        the id_string of the events. The date part of id_string is compared
+        by day only, since the time part is not formatted consistently
+
+        :param matching: terms that must all be contained in id_string
+        :type matching: list
+    """
+    conditions = []
+    if fromDate is not None or toDate is not None:
+        idRange = {}
+        if fromDate is not None:
+            idRange["$gte"] = fromDate.strftime("%Y-%m-%d")
+        if toDate is not None:
+            # ~ sorts after all characters used in id_string
+            idRange["$lt"] = toDate.strftime("%Y-%m-%d") + "~"
+        conditions.append({"id_string": idRange})
+    for term in matching or []:
+        conditions.append({"id_string": {"$regex": re.escape(term), "$options": "i"}})
+
+    if not conditions:
+        return {}
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def ensureIndexes(store):
+    """ Creates the index on id_string that getEventFilter relies on. The
+        events can still be queried without it, so only database errors are
+        logged
+    """
+    collection = store._get_collection(collection_name="event")
+    if collection.full_name not in INDEXED_COLLECTIONS:
+        try:
+            collection.create_index("id_string")
+            INDEXED_COLLECTIONS.add(collection.full_name)
+        except PyMongoError:
+            logging.getLogger(__name__).exception(
+                "Incident store could not be indexed, events are queried without index on id_string")
+
+
+def getEvents(store, fromDate=None, toDate=None, matching=None):
+    """ Returns the unresolved events scheduled within the given window
+        whose id_string contains all matching terms
+    """
+    ensureIndexes(store)
+    return filterByScheduledTime(
+        store.get_events(filter_dict=getEventFilter(fromDate, toDate, matching), resolve=False),
+        fromDate,
+        toDate)
+
+
+def getEventsPage(store, fromDate=None, toDate=None, matching=None, after=None, limit=50):
+    """ Returns one page of the events of getEvents, ordered by id_string
+        descending like ``get_events``. The page starts after the id_string
+        ``after``, so that pages stay stable while new events come in
+
+        :returns: tuple of the events and the cursor of the next page, which
+            is None on the last page
+    """
+    ensureIndexes(store)
+    eventFilter = getEventFilter(fromDate, toDate, matching)
+    if after is not None:
+        eventFilter = {"$and": [eventFilter, {"id_string": {"$lt": after}}]}
+
+    found = list(
+        store._get_collection(collection_name="event")
+        .find(eventFilter, {"_id": False})
+        .sort("id_string", -1)
+        .limit(limit + 1)
+    )
+    nextCursor = None
+    if len(found) > limit:
+        found = found[0:limit]
+        nextCursor = found[-1]["id_string"]
+    return filterByScheduledTime(found, fromDate, toDate), nextCursor
+
+
+def searchIncidents(store, uniqueString, limit=100):
+    """ Searches the incidents whose unique_string starts with the given
+        string. The search is anchored at the start, so that the unique index
+        on unique_string is used
+
+        :returns: tuple of the most recently pushed incidents, at most
+            ``limit``, and the total number of matches
+    """
+    query = {"unique_string": {"$regex": "^" + re.escape(uniqueString)}}
+    collection = store._get_collection(collection_name="incident")
+    incidents = list(
+        collection.find(query, {"_id": False})
+        .sort("provider_info.pushed", -1)
+        .limit(limit)
+    )
+    if len(incidents) < limit:
+        return incidents, len(incidents)
+    return incidents, collection.count_documents(query)
+
+
+def resolveEvents(store, events):
+    """ Same as ``store.resolve_event`` for every event, but the incidents
+        referenced by all events are loaded with a single query and then
+        assigned to their event and call
+    """
+    references = []
+    for event in events:
+        for call in INCIDENT_CALLS:
+            callDict = event.get(call, None)
+            if callDict is not None and callDict.get("incidents", None) is not None:
+                references.extend(x for x in callDict["incidents"] if type(x) != dict)
+
+    incidents = {}
+    if references:
+        for incident in store._get_collection(collection_name="incident").find({"_id": {"$in": references}}):
+            incident.pop("id_string", None)
+            incidents[incident.pop("_id")] = incident
+
+    for event in events:
+        for call in INCIDENT_CALLS:
+            callDict = event.get(call, None)
+            if callDict is None or callDict.get("incidents", None) is None:
+                continue
+            anyId = None
+            resolved = []
+            for reference in callDict["incidents"]:
+                if type(reference) == dict:
+                    incident = reference
+                elif reference in incidents:
+                    incident = dict(incidents[reference])
+                else:
+                    logging.getLogger(__name__).warning(
+                        "Reference to incident invalid, event=" + event["id_string"])
+                    continue
+                incident.pop("call", None)
+                anyId = incident.pop("id", None)
+                resolved.append(incident)
+            callDict["incidents"] = resolved
+            if event.get("id", None) is None and anyId is not None:
+                event["id"] = anyId
+    return events
+
+
+def getEventCall(store, idString, call):
+    """ Loads only the given call of an event, with its incidents resolved
+
+        :returns: tuple of the event and its ETag, see getCallETag
+    """
+    event = store._get_collection(collection_name="event").find_one(
+        {"id_string": id_to_string(idString)},
+        {"_id": False, "id": True, "id_string": True, call: True}
+    )
+    if not event:
+        raise EventNotFoundException()
+    etag = getCallETag(event, call)
+    resolveEvents(store, [event])
+    return event, etag
+
+
+def getCallETag(event, call):
+    """ The incidents of a call only change when new incidents are referenced
+        or the status changes, which is both part of the unresolved event
+    """
+    callDict = event.get(call, None) or {}
+    fingerprint = json.dumps(
+        [event["id_string"], call, len(callDict.get("incidents", None) or []), callDict.get("status", None)],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+
+
+def iterEventPages(store, fromDate=None, toDate=None, matching=None, after=None, limit=50, firstPage=None):
+    """ Yields all pages of getEventsPage, only one page is held in memory
+
+        :param firstPage: result of getEventsPage if already loaded
+    """
+    while True:
+        if firstPage is not None:
+            (events, after), firstPage = firstPage, None
+        else:
+            events, after = getEventsPage(store, fromDate, toDate, matching, after, limit)
+        yield events
+        if after is None:
+            break
@@ -2,29 +2,86 @@
 import pkg_resources
 from datetime import timedelta
 import logging
+import time
 
 from bos_mint import Config
 
-from .node import Node, NodeException
+from .node import Node, NodeException, initWorkerConnection
 from . import tostring, __VERSION__
-from . import datestring
+from . import datestring, chain_listener
 
+from .background import PeriodicJob
 from .dataproxy_link.ping import Ping
+from .shared_cache import SharedCache
+from .proposal_tracker import ProposalTracker
 
 from flask import (
     flash
 )
 
-CACHE_VERSIONS = None
-CACHE_ACCOUNTS = None
+# keys in the shared cache, visible to all worker processes
+CACHE_VERSIONS = "menu.versions"
+CACHE_ACCOUNTS = "menu.accounts"
+MENU_SNAPSHOT = "menu.snapshot"
 
 
 def clear_accounts_cache():
-    global CACHE_ACCOUNTS
-    CACHE_ACCOUNTS = None
+    SharedCache().delete(CACHE_ACCOUNTS)
+    MENU_REFRESHER.trigger()
 
 
 def getMenuInfo():
+    """ Returns the latest menu snapshot of MENU_REFRESHER. The menu is
+        only built within the request if there is no snapshot yet or it is
+        outdated. Pending operations and wallet lock are always current
+    """
+    maxAge = Config.get("menu", "max_age_in_seconds", 30)
+    snapshot = SharedCache().get(MENU_SNAPSHOT)
+    if snapshot is None or time.time() - snapshot["time"] > maxAge:
+        snapshot = refreshMenuInfo()
+    menuInfo = dict(snapshot["menuInfo"])
+
+    for message, category in menuInfo.pop('notifications'):
+        flash(message, category=category)
+
+    numberOfOpenTransactions = 0
+    try:
+        currentTransaction = Node().getPendingTransaction()
+        if currentTransaction:
+            numberOfOpenTransactions = len(currentTransaction.ops)
+    except NodeException:
+        pass
+    menuInfo['numberOfOpenTransactions'] = numberOfOpenTransactions
+
+    walletLocked = True
+    try:
+        walletLocked = Node().locked()
+    except Exception:
+        pass
+    menuInfo['walletLocked'] = walletLocked
+
+    return menuInfo
+
+
+def refreshMenuInfo():
+    snapshot = {"menuInfo": buildMenuInfo(), "time": time.time()}
+    SharedCache().set(MENU_SNAPSHOT, snapshot)
+    return snapshot
+
+
+def refreshMenuInfoIfOutdated():
+    """ Another worker process might have refreshed the menu already """
+    snapshot = SharedCache().get(MENU_SNAPSHOT)
+    interval = Config.get("menu", "refresh_interval_in_seconds", 5)
+    if snapshot is None or time.time() - snapshot["time"] >= interval / 2:
+        refreshMenuInfo()
+
+
+def buildMenuInfo():
+    """ Builds the menu info that needs the blockchain. Warnings are
+        collected in the notifications list and flashed on render
+    """
+    notifications = []
     info_less = Config.get("notifications", "accountLessThanCoreInfo", 1000)
     warning_less = Config.get("notifications", "accountLessThanCoreWarning", 200)
 
@@ -33,9 +90,9 @@ def getMenuInfo():
         for balance in witnessAccount.balances:
             if balance.asset["id"] == "1.3.0":
                 if float(balance) < warning_less:
-                    flash("Account witness-account has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish immediately", category="warning")
+                    notifications.append(("Account witness-account has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish immediately", "warning"))
                 elif float(balance) < info_less:
-                    flash("Account witness-account has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish")
+                    notifications.append(("Account witness-account has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish", "message"))
     except NodeException:
         pass
 
@@ -44,9 +101,9 @@ def getMenuInfo():
         for balance in account.balances:
             if balance.asset["id"] == "1.3.0":
                 if float(balance) < warning_less:
-                    flash("Account " + account.name + " has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish immediately", category="warning")
+                    notifications.append(("Account " + account.name + " has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish immediately", "warning"))
                 elif float(balance) < info_less:
-                    flash("Account " + account.name + " has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish")
+                    notifications.append(("Account " + account.name + " has only " + str(float(balance)) + " " + balance.asset["symbol"] + ", please replenish", "message"))
         accountDict = {
             'id': account.identifier,
             'name': account.name,
@@ -61,72 +118,58 @@ def getMenuInfo():
         else:
             accountDict = {'id': '-', 'name': '-', 'toString': 'Please add an account'}
 
-    numberOfOpenTransactions = 0
-    try:
-        currentTransaction = Node().getPendingTransaction()
-        if currentTransaction:
-            numberOfOpenTransactions = len(Node().getPendingTransaction().ops)
-    except NodeException:
-        pass
-
-    numberOfVotableProposals = 0
-    try:
-        numberOfVotableProposals = len(Node().getAllProposals())
-    except NodeException:
-        pass
-
-    walletLocked = True
-    try:
-        walletLocked = Node().locked()
-    except Exception:
-        pass
+    numberOfVotableProposals = ProposalTracker().count()
+    numberOfNewProposals = len(ProposalTracker().getNewSinceLastSeen())
 
-    global CACHE_VERSIONS
-    if CACHE_VERSIONS is None:
-        CACHE_VERSIONS = {}
+    versions = SharedCache().get(CACHE_VERSIONS)
+    if versions is None:
+        versions = {}
         for name in ["bos-incidents", "peerplays", "bookiesports"]:
             try:
-                CACHE_VERSIONS[name] = pkg_resources.require(name)[0].version
+                versions[name] = pkg_resources.require(name)[0].version
             except pkg_resources.DistributionNotFound:
-                CACHE_VERSIONS[name] = "not installed"
+                versions[name] = "not installed"
+        SharedCache().set(CACHE_VERSIONS, versions)
 
     menuInfo = {
         'account': accountDict,
-        'numberOfOpenTransactions': numberOfOpenTransactions,
+        'notifications': notifications,
         'numberOfVotableProposals': numberOfVotableProposals,
-        'walletLocked': walletLocked,
+        'numberOfNewProposals': numberOfNewProposals,
         'version': __VERSION__,
-        'versions': CACHE_VERSIONS
+        'versions': versions
     }
 
-    global CACHE_ACCOUNTS
-    if CACHE_ACCOUNTS is None:
-        CACHE_ACCOUNTS = []
+    allAccounts = SharedCache().get(CACHE_ACCOUNTS)
+    if allAccounts is None:
+        allAccounts = []
         try:
             for account in Node().getAllAccountsOfWallet():
                 if account['name']:
-                    CACHE_ACCOUNTS.append({
+                    allAccounts.append({
                         'id': account['account'].identifier,
                         'name': account['account'].name,
                         'publicKey': account['pubkey'],
                         'toString': account['account'].identifier + ' - ' + account['account'].name})
                 else:
-                    CACHE_ACCOUNTS.append({
+                    allAccounts.append({
                         'id': 'None',
                         'name': 'This shouldnt happen',
                         'publicKey': 'None',
                         'toString': 'None - Error shouldnt happen' + account['pubkey']})
+            SharedCache().set(CACHE_ACCOUNTS, allAccounts)
         except NodeException:
             pass
 
-    menuInfo['allAccounts'] = CACHE_ACCOUNTS
+    menuInfo['allAccounts'] = allAccounts
 
     try:
+        dynamicGlobalProperties = Node().get_node().rpc.get_object("2.1.0")
         menuInfo['chain'] = {
             "name": Config.get("connection", "use"),
             "id": Node().get_node().rpc.chain_params["chain_id"],
-            "block": Node().get_node().rpc.get_object("2.1.0")["head_block_number"],
-            "time": Node().get_node().rpc.get_object("2.1.0")["time"] + "Z"
+            "block": dynamicGlobalProperties["head_block_number"],
+            "time": dynamicGlobalProperties["time"] + "Z"
         }
     except Exception as e:
         menuInfo['chain'] = {
@@ -148,6 +191,24 @@ def getMenuInfo():
 
     menuInfo["advanced_features"] = Config.get("advanced_features", False)
 
-    logging.getLogger(__name__).debug("getMenuInfo done")
+    logging.getLogger(__name__).debug("buildMenuInfo done")
 
     return menuInfo
+
+
+#: Rebuilds the menu snapshot in the background, with its own connection
+MENU_REFRESHER = PeriodicJob(
+    "bos-mint-menu-refresher",
+    lambda: Config.get("menu", "refresh_interval_in_seconds", 5),
+    refreshMenuInfoIfOutdated,
+    initializer=initWorkerConnection,
+    leaderOnly=True
+)
+
+
+def onChainEvent(eventType, payload):
+    if eventType == "block":
+        MENU_REFRESHER.trigger()
+
+
+chain_listener.subscribe(onChainEvent)
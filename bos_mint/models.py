@@ -61,3 +61,43 @@ class ViewConfiguration(db.Model):
                     return False
 
             return vc.value
+
+
+class IndexedObject(db.Model):
+    """ Object of the sport hierarchy stored in the local index, see
+        hierarchy_index
+    """
+    identifier = db.Column(db.String(32), primary_key=True)
+    typeName = db.Column(db.String(32), index=True)
+    parentId = db.Column(db.String(32), index=True)
+    data = db.Column(db.Text)
+
+
+class IndexedList(db.Model):
+    """ Marks that all children of typeName below parentId are indexed
+    """
+    typeName = db.Column(db.String(32), primary_key=True)
+    parentId = db.Column(db.String(32), primary_key=True)
+
+
+class IndexedProposal(db.Model):
+    """ Open proposal that will change indexed objects once executed
+    """
+    proposalId = db.Column(db.String(32), primary_key=True)
+    affected = db.Column(db.Text)
+    expiration = db.Column(db.String(32), index=True)
+
+
+class WitnessSample(db.Model):
+    """ Beacon sample of a witness. Every witness has a fixed number of
+        slots that are overwritten round robin, see witness_health
+    """
+    witnessName = db.Column(db.String(128), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)
+    sequence = db.Column(db.Integer)
+    time = db.Column(db.Float)
+    ok = db.Column(db.Integer)
+    failed = db.Column(db.Integer)
+    scheduler = db.Column(db.Boolean)
+    version = db.Column(db.String(128))
+    error = db.Column(db.String(256))
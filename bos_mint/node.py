@@ -1,6 +1,16 @@
-from . import wrapper
-
+from . import wrapper, Config, chain_listener
+from .cache import ObjectCache
+from .node_pool import NodePool
+from .chain_listener import ChainListener
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
+from flask import g, has_app_context
+from peerplays.peerplays import PeerPlays
 from peerplays.account import Account
 from peerplays.sport import Sport, Sports
 from peerplays.eventgroup import EventGroups, EventGroup
@@ -36,6 +46,108 @@ class ApiServerDown(NodeException):
     pass
 
 
+#: Shared cache of blockchain objects, keyed by object id
+OBJECT_CACHE = ObjectCache(
+    max_size=Config.get("cache", "max_size", 2000),
+    ttl=Config.get("cache", "ttl_in_seconds", 60)
+)
+
+_MISSING = object()
+
+#: Connections owned by the current thread, see Node.get_node
+_threadLocal = threading.local()
+
+#: Connections to all configured nodes, used for lookups
+NODE_POOL = NodePool()
+
+
+def getRequestIdentityMap():
+    """ Objects looked up within the current request, keyed by object id.
+        None outside of a request
+    """
+    if not has_app_context():
+        return None
+    if "identityMap" not in g:
+        g.identityMap = {}
+    return g.identityMap
+
+
+def countChainLookup():
+    if has_app_context():
+        g.chainLookups = g.get("chainLookups", 0) + 1
+
+
+def readThrough(node, key, lookup):
+    """ Answers from the identity map of the current request, then from the
+        shared cache, and calls ``lookup`` otherwise
+    """
+    identityMap = getRequestIdentityMap()
+    if identityMap is not None and key in identityMap:
+        return identityMap[key]
+
+    if Config.get("cache", "enabled", True):
+        node.ensureCacheIsCurrent()
+        res = OBJECT_CACHE.get(key, _MISSING)
+        if res is _MISSING:
+            res = lookup()
+            OBJECT_CACHE.set(key, res)
+    else:
+        res = lookup()
+
+    if identityMap is not None:
+        identityMap[key] = res
+    return res
+
+
+def cachedObject(func):
+    """ Read-through cache for getters that take an object id. Within a
+        request every object is looked up at most once, the shared cache is
+        flushed as soon as the head block advances
+    """
+    @wraps(func)
+    def wrapper(self, identifier):
+        return readThrough(self, identifier, lambda: func(self, identifier))
+
+    return wrapper
+
+
+def cachedList(typeName):
+    """ Read-through cache for getters that list all children of typeName
+        below a parent id
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, parentId):
+            return readThrough(self, ("list", typeName, parentId), lambda: func(self, parentId))
+
+        return wrapper
+
+    return decorator
+
+
+def pooledLookup(func):
+    """ Routes the lookups of a getter to the node pool, unless the current
+        thread is bound to its own connection already
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kw):
+        countChainLookup()
+        if getattr(_threadLocal, "instance", None) is not None or\
+                not NODE_POOL.enabled():
+            return func(self, *args, **kw)
+
+        def lookup(instance):
+            _threadLocal.instance = instance
+            try:
+                return func(self, *args, **kw)
+            finally:
+                _threadLocal.instance = None
+
+        return NODE_POOL.call(lookup)
+
+    return wrapper
+
+
 def proposedOperation(func):
     @wraps(func)
     def wrapper(self, *arg, **kw):
@@ -63,10 +175,36 @@ def proposedOperation(func):
     return wrapper
 
 
+def initWorkerConnection():
+    """ Every worker thread gets its own connection, since the websocket
+        of the shared instance must not be used concurrently
+    """
+    try:
+        use = Config.get("connection", "use")
+        _threadLocal.instance = PeerPlays(**Config.get("connection", use))
+    except Exception as ex:
+        logging.getLogger(__name__).warning(
+            "Traversal worker falls back to shared connection: " + str(ex))
+
+
 class Node(object):
     #: The static connection
     pendingProposal = None
 
+    #: Account names by id, filled by getAccountNames
+    accountNames = {}
+
+    #: Worker pool used for traversing the object hierarchy
+    traversalExecutor = None
+    traversalExecutorLock = threading.Lock()
+
+    #: Durations of each level of the last traversal of all events
+    lastTraversal = None
+
+    #: Head block the object cache was filled at
+    headBlockNumber = None
+    lastHeadBlockCheck = 0
+
     def __init__(self):
         """ This class is a singelton and makes sure that only one
             connection to the node is established and shared among
@@ -74,8 +212,68 @@ class Node(object):
         """
 
     def get_node(self):
+        """ Returns the connection of the current thread, which is a pool
+            connection during lookups, or the shared instance that is used
+            for the wallet and transactions
+        """
+        instance = getattr(_threadLocal, "instance", None)
+        if instance is not None:
+            return instance
         return shared_peerplays_instance()
 
+    def ensureCacheIsCurrent(self):
+        """ Flushes the object cache if the head block advanced. The head
+            block is looked up at most once per configured interval. Not
+            necessary while the chain listener publishes changes
+        """
+        if ChainListener().isReceiving():
+            return
+
+        interval = Config.get("cache", "head_block_check_interval_in_seconds", 3)
+        now = time.time()
+        if now - Node.lastHeadBlockCheck < interval:
+            return
+        Node.lastHeadBlockCheck = now
+
+        try:
+            headBlockNumber = self.get_node().rpc.get_object("2.1.0")["head_block_number"]
+        except Exception:
+            # we can't tell if anything changed
+            self.invalidateCache()
+            return
+
+        if headBlockNumber != Node.headBlockNumber:
+            Node.headBlockNumber = headBlockNumber
+            self.invalidateCache()
+
+    def invalidateCache(self, identifier=None):
+        OBJECT_CACHE.invalidate(identifier)
+
+        identityMap = getRequestIdentityMap()
+        if identityMap is not None:
+            if identifier is None:
+                identityMap.clear()
+            else:
+                identityMap.pop(identifier, None)
+
+    def invalidateLists(self, typeName):
+        OBJECT_CACHE.invalidateWhere(
+            lambda key, value: isinstance(key, tuple) and key[0:2] == ("list", typeName))
+
+    def invalidateSubtree(self, typeName, identifier):
+        """ Drops the object and all cached objects below it, e.g. the
+            betting market groups and markets of an event
+        """
+        OBJECT_CACHE.invalidate(identifier)
+        childType = chain_listener.CHILD_TYPE.get(typeName)
+        if childType:
+            OBJECT_CACHE.invalidate(("list", childType, identifier))
+            parentField = chain_listener.PARENT_FIELD[childType]
+            removed = OBJECT_CACHE.invalidateWhere(
+                lambda key, value: isinstance(value, dict) and value.get(parentField) == identifier)
+            for childId, child in removed:
+                self.invalidateSubtree(childType, childId)
+
     @proposedOperation
     def sync(self, chain_name):
         w = Lookup(peerplays_instance=self.get_node(),
@@ -141,6 +339,48 @@ class Node(object):
         except Exception as ex:
             raise NodeException(ex.__class__.__name__ + ": " + str(ex))
 
+    @pooledLookup
+    def getAccountObjects(self, idList):
+        """ Loads the raw account objects of all given ids with a single
+            ``get_objects`` call and remembers their names
+        """
+        idList = list(idList)
+        if not idList:
+            return []
+        try:
+            accounts = [x for x in self.get_node().rpc.get_objects(idList) if x is not None]
+        except Exception as ex:
+            raise NodeException(ex.__class__.__name__ + ": " + str(ex))
+        for account in accounts:
+            Node.accountNames[account["id"]] = account["name"]
+        return accounts
+
+    @pooledLookup
+    def getObjects(self, idList):
+        """ Loads the raw objects of all given ids with a single
+            ``get_objects`` call
+
+            :returns: dict of id to object, unknown ids are left out
+        """
+        idList = list(idList)
+        if not idList:
+            return {}
+        try:
+            objects = self.get_node().rpc.get_objects(idList)
+        except Exception as ex:
+            raise NodeException(ex.__class__.__name__ + ": " + str(ex))
+        return {x["id"]: x for x in objects if x is not None}
+
+    def getAccountNames(self, idList):
+        """ Resolves account ids to names. Names are memoized for the
+            lifetime of the process, only unknown ids are requested (in one
+            batch)
+        """
+        missing = set(x for x in idList if x not in Node.accountNames)
+        if missing:
+            self.getAccountObjects(missing)
+        return {x: Node.accountNames[x] for x in idList if x in Node.accountNames}
+
     def selectAccount(self, accountId):
         # if there are any pending operations the user need to finish
         # that first
@@ -225,6 +465,7 @@ class Node(object):
     def _get_exception_message(self, ex):
         return ex.__class__.__name__ + ": " + str(ex)
 
+    @pooledLookup
     def getAsset(self, name_or_id):
         try:
             return Asset(name_or_id, peerplays_instance=self.get_node())
@@ -232,6 +473,8 @@ class Node(object):
             raise NodeException(
                 "Asset (id={}) could not be loaded: {}".format(name_or_id, self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getSport(self, name):
         try:
             # select sport
@@ -242,6 +485,8 @@ class Node(object):
             raise NodeException(
                 "Sport (id={}) could not be loaded: {}".format(name, self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getEventGroup(self, sportId):
         try:
             return EventGroup(sportId, peerplays_instance=self.get_node())
@@ -249,6 +494,7 @@ class Node(object):
             raise NodeException(
                 "EventGroups could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @pooledLookup
     def getSportAsList(self, name):
         try:
             sport = Sport(name, peerplays_instance=self.get_node())
@@ -257,6 +503,8 @@ class Node(object):
             raise NodeException(
                 "EventGroups could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getEvent(self, eventId):
         try:
             return Event(eventId, peerplays_instance=self.get_node())
@@ -264,6 +512,8 @@ class Node(object):
             raise NodeException(
                 "Event could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getBettingMarketGroup(self, bmgId):
         try:
             return BettingMarketGroup(bmgId,
@@ -272,6 +522,8 @@ class Node(object):
             raise NodeException(
                 "BettingMarketGroup could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getBettingMarket(self, bmId):
         try:
             return BettingMarket(bmId, peerplays_instance=self.get_node())
@@ -279,6 +531,8 @@ class Node(object):
             raise NodeException(
                 "BettingMarkets could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedObject
+    @pooledLookup
     def getBettingMarketGroupRule(self, bmgrId):
         try:
             return Rule(bmgrId, peerplays_instance=self.get_node())
@@ -286,12 +540,14 @@ class Node(object):
             raise NodeException(
                 "BettingMarkets could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @pooledLookup
     def getSports(self):
         try:
             return Sports(peerplays_instance=self.get_node()).sports
         except Exception as ex:
             raise NodeException("Sports could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @pooledLookup
     def getSportsAsList(self):
         try:
             sports = Sports(peerplays_instance=self.get_node()).sports
@@ -299,6 +555,8 @@ class Node(object):
         except Exception as ex:
             raise NodeException("Sports could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedList("eventgroup")
+    @pooledLookup
     def getEventGroups(self, sportId):
         if not sportId:
             raise NonScalableRequest
@@ -309,17 +567,60 @@ class Node(object):
             raise NodeException(
                 "EventGroups could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    def getTraversalExecutor(self):
+        with Node.traversalExecutorLock:
+            if Node.traversalExecutor is None:
+                Node.traversalExecutor = ThreadPoolExecutor(
+                    max_workers=Config.get("traversal", "max_workers", 8),
+                    initializer=initWorkerConnection
+                )
+            return Node.traversalExecutor
+
+    def _fanOut(self, getter, identifiers):
+        """ Calls getter for all identifiers concurrently and concatenates
+            the returned lists, keeping the order of identifiers
+        """
+        results = self.getTraversalExecutor().map(getter, identifiers)
+        return [item for result in results for item in result]
+
+    def getAllEvents(self):
+        """ Walks sports, event groups and events level by level. All
+            requests of one level are issued concurrently, the duration of
+            each level is stored in Node.lastTraversal
+        """
+        timings = OrderedDict()
+
+        start = time.time()
+        sports = self.getSports()
+        timings["sports"] = time.time() - start
+
+        start = time.time()
+        eventgroups = self._fanOut(self.getEventGroups, [x["id"] for x in sports])
+        timings["eventgroups"] = time.time() - start
+
+        start = time.time()
+        events = self._fanOut(self.getEvents, [x["id"] for x in eventgroups])
+        timings["events"] = time.time() - start
+
+        Node.lastTraversal = {
+            "timings": timings,
+            "sports": len(sports),
+            "eventgroups": len(eventgroups),
+            "events": len(events)
+        }
+        logging.getLogger(__name__).info(
+            "Traversed all events: " + ", ".join(
+                "{} {:.3f}s".format(key, value) for key, value in timings.items()))
+        return events
+
     def getEvents(self, eventGroupId):
         if eventGroupId == "all":
-            all_events = []
-            sports = self.getSports()
-            for sport in sports:
-                eventgroups = self.getEventGroups(sport["id"])
-                for eventgroup in eventgroups:
-                    events = self.getEvents(eventgroup["id"])
-                    for event in events:
-                        all_events.append(event)
-            return all_events
+            return self.getAllEvents()
+        return self.getEventsOfEventGroup(eventGroupId)
+
+    @cachedList("event")
+    @pooledLookup
+    def getEventsOfEventGroup(self, eventGroupId):
         if not eventGroupId:
             raise NonScalableRequest
         try:
@@ -329,6 +630,7 @@ class Node(object):
             raise NodeException(
                 "Events could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @pooledLookup
     def getBettingMarketGroupRules(self):
         try:
             return Rules(peerplays_instance=self.get_node()).rules
@@ -336,6 +638,8 @@ class Node(object):
             raise NodeException(
                 "BettingMarketGroupRules could not be loaded:{}".format(self._get_exception_message(ex)))
 
+    @cachedList("bettingmarketgroup")
+    @pooledLookup
     def getBettingMarketGroups(self, eventId):
         if not eventId:
             raise NonScalableRequest
@@ -347,6 +651,8 @@ class Node(object):
             raise NodeException(
                 "BettingMarketGroup could not be loaded: {}".format(self._get_exception_message(ex)))
 
+    @cachedList("bettingmarket")
+    @pooledLookup
     def getBettingMarkets(self, bettingMarketGroupId):
         if not bettingMarketGroupId:
             raise NonScalableRequest
@@ -523,16 +829,20 @@ class Node(object):
                     returnV = self.get_node().broadcast()
                 self.get_node().clear()
                 Node.pendingProposal = []
+                self.invalidateCache()
                 return returnV
         except Exception as ex:
             raise NodeException(ex.__class__.__name__ + ": " + str(ex))
 
     def acceptProposal(self, proposalId):
         try:
-            return self.get_node().approveproposal(
+            returnV = self.get_node().approveproposal(
                 [proposalId],
                 self.getSelectedAccountName(),
                 self.getSelectedAccountName())
+            # the approval may have executed the proposal
+            self.invalidateCache()
+            return returnV
         except Exception as ex:
             raise NodeException(ex.__class__.__name__ + ": " + str(ex))
 
@@ -555,3 +865,23 @@ class Node(object):
                 append_to=self.getPendingProposal())
         except Exception as ex:
             raise NodeException(ex.__class__.__name__ + ": " + str(ex))
+
+
+def onChainEvent(eventType, payload):
+    """ Keeps the object cache current with the events published by the
+        chain listener
+    """
+    if eventType == "block":
+        Node.headBlockNumber = payload["block_num"]
+        if payload["gap"]:
+            Node().invalidateCache()
+    elif eventType == "reset":
+        Node().invalidateCache()
+    elif eventType == "object":
+        # the object might have been created or moved to another parent
+        Node().invalidateLists(payload["typeName"])
+        if payload["id"] is not None:
+            Node().invalidateSubtree(payload["typeName"], payload["id"])
+
+
+chain_listener.subscribe(onChainEvent)
@@ -0,0 +1,244 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from peerplays.peerplays import PeerPlays
+
+from . import Config
+
+#: exceptions that indicate a broken connection instead of a failed lookup
+CONNECTION_ERRORS = [
+    "NumRetriesReached",
+    "RPCConnection",
+    "WebSocketConnectionClosedException",
+    "WebSocketTimeoutException",
+    "ConnectionRefusedError",
+    "ConnectionResetError",
+    "TimeoutError",
+]
+
+
+def isConnectionError(ex):
+    message = ex.__class__.__name__ + ": " + str(ex)
+    return any(x in message for x in CONNECTION_ERRORS)
+
+
+class Endpoint(object):
+    """ One node of the pool with its own connection. The websocket must not
+        be used concurrently, the lock is held for the duration of a lookup
+    """
+
+    def __init__(self, url, connectionConfig):
+        self.url = url
+        self.connectionConfig = connectionConfig
+        self.instance = None
+        self.lock = threading.Lock()
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.ejectedUntil = 0
+        #: a lookup was abandoned and still occupies its worker thread
+        self.stalled = False
+
+    def isHealthy(self):
+        return time.time() >= self.ejectedUntil
+
+    def connect(self):
+        if self.instance is None:
+            self.instance = PeerPlays(node=self.url, **self.connectionConfig)
+        return self.instance
+
+    def recordLatency(self, seconds, smoothing):
+        self.requests += 1
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = smoothing * seconds + (1 - smoothing) * self.latency
+
+    def eject(self, cooldown):
+        """ The connection is closed by the lookup holding the lock, see
+            NodePool._run
+        """
+        self.errors += 1
+        self.ejections += 1
+        self.ejectedUntil = time.time() + cooldown
+
+    def close(self):
+        """ Closes the websocket, must only be called with the lock held """
+        instance, self.instance = self.instance, None
+        if instance is None:
+            return
+        try:
+            rpc = instance.rpc
+            if hasattr(rpc, "close"):
+                rpc.close()
+            else:
+                rpc.ws.close()
+        except Exception as ex:
+            logging.getLogger(__name__).debug(
+                "Connection to {} could not be closed: {}".format(self.url, str(ex)))
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "healthy": self.isHealthy(),
+            "latency": self.latency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "stalled": self.stalled,
+            "ejected_until": self.ejectedUntil if not self.isHealthy() else None
+        }
+
+
+class NodePool(object):
+    """ Connections to all nodes configured for the chain in use. Lookups
+        are routed to the healthy node with the lowest average latency that
+        is not busy, nodes that fail or answer slower than
+        ``eject_after_seconds`` are ejected for ``cooldown_in_seconds``.
+
+        Transactions and the wallet stay on the shared instance, see
+        Node.get_node. Lookups run in the executor of the pool, so that a
+        stalled node can be abandoned after ``eject_after_seconds``. An
+        abandoned lookup keeps its worker thread until the node answers,
+        new lookups fail once all ``max_workers`` threads are busy
+    """
+
+    def __init__(self):
+        self.endpoints = None
+        self.executor = None
+        #: lookups submitted to the executor and not finished yet
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def enabled(self):
+        return Config.get("node_pool", "enabled", True) and len(self.getEndpoints()) > 1
+
+    def getEndpoints(self):
+        with self._lock:
+            if self.endpoints is None:
+                use = Config.get("connection", "use")
+                connectionConfig = dict(Config.get("connection", use, {}) or {})
+                nodes = connectionConfig.pop("node", None) or []
+                if not isinstance(nodes, list):
+                    nodes = [nodes]
+                self.endpoints = [Endpoint(url, connectionConfig) for url in nodes if url]
+            return self.endpoints
+
+    def getExecutor(self):
+        with self._lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=Config.get("node_pool", "max_workers", 16),
+                    thread_name_prefix="bos-mint-node-pool")
+            return self.executor
+
+    def _candidates(self):
+        endpoints = self.getEndpoints()
+        healthy = [x for x in endpoints if x.isHealthy()]
+        if not healthy:
+            # all ejected, the one that recovers first is tried anyway
+            healthy = sorted(endpoints, key=lambda x: x.ejectedUntil)[0:1]
+        # unmeasured nodes first, so that every node gets a latency
+        return sorted(healthy, key=lambda x: -1 if x.latency is None else x.latency)
+
+    def _acquire(self, exclude, timeout):
+        candidates = [x for x in self._candidates() if x not in exclude]
+        if not candidates:
+            return None
+        for endpoint in candidates:
+            if endpoint.lock.acquire(blocking=False):
+                return endpoint
+        # all busy, wait for the fastest one
+        if candidates[0].lock.acquire(timeout=timeout):
+            return candidates[0]
+        return None
+
+    def _run(self, endpoint, func, state):
+        close = False
+        try:
+            return func(endpoint.connect())
+        except Exception as ex:
+            close = isConnectionError(ex)
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+                state["finished"] = True
+                if state["abandoned"]:
+                    endpoint.stalled = False
+                    close = True
+            if close:
+                # no other lookup uses the connection while the lock is held
+                endpoint.close()
+            endpoint.lock.release()
+
+    def _submit(self, endpoint, func, state):
+        maxWorkers = Config.get("node_pool", "max_workers", 16)
+        with self._lock:
+            if self.pending >= maxWorkers:
+                raise Exception(
+                    "All {} node pool workers are busy with stalled lookups".format(maxWorkers))
+            self.pending += 1
+        try:
+            return self.getExecutor().submit(self._run, endpoint, func, state)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+
+    def call(self, func):
+        """ Calls ``func(instance)`` on the best endpoint. On connection
+            errors or if the node doesn't answer within
+            ``eject_after_seconds``, the lookup is repeated once on the next
+            best endpoint
+        """
+        smoothing = Config.get("node_pool", "latency_smoothing", 0.3)
+        ejectAfter = Config.get("node_pool", "eject_after_seconds", 5)
+        cooldown = Config.get("node_pool", "cooldown_in_seconds", 30)
+
+        tried = []
+        lastError = None
+        while len(tried) < 2:
+            endpoint = self._acquire(tried, ejectAfter)
+            if endpoint is None:
+                break
+            tried.append(endpoint)
+            start = time.time()
+            state = {"finished": False, "abandoned": False}
+            try:
+                # the lock is released by _run, even after a timeout
+                future = self._submit(endpoint, func, state)
+            except Exception:
+                endpoint.lock.release()
+                raise
+            try:
+                res = future.result(timeout=ejectAfter)
+                endpoint.recordLatency(time.time() - start, smoothing)
+                return res
+            except TimeoutError:
+                with self._lock:
+                    if not state["finished"]:
+                        # closed by _run once the lookup returns
+                        state["abandoned"] = True
+                        endpoint.stalled = True
+                lastError = TimeoutError(
+                    "Node {} did not answer within {}s, its lookup occupies a worker until it returns".format(
+                        endpoint.url, ejectAfter))
+            except Exception as ex:
+                if not isConnectionError(ex):
+                    endpoint.recordLatency(time.time() - start, smoothing)
+                    raise
+                lastError = ex
+            logging.getLogger(__name__).warning(
+                "Ejecting node {}: {}".format(endpoint.url, str(lastError)))
+            endpoint.eject(cooldown)
+
+        if lastError is None:
+            raise Exception("No node available")
+        raise lastError
+
+    def stats(self):
+        return [x.stats() for x in self.getEndpoints()]
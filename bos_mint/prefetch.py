@@ -0,0 +1,64 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Config
+from .node import Node, initWorkerConnection
+
+# getter that lists the children of the given type
+CHILDREN_GET = {
+    'sport': lambda tmpId: Node().getEventGroups(tmpId),
+    'eventgroup': lambda tmpId: Node().getEvents(tmpId),
+    'event': lambda tmpId: Node().getBettingMarketGroups(tmpId),
+    'bettingmarketgroup': lambda tmpId: Node().getBettingMarkets(tmpId),
+}
+
+
+class Prefetcher(object):
+    """ Warms the object cache with the children of the objects that were
+        just displayed, so that the next click into the hierarchy is served
+        from the cache. Prefetches that exceed ``max_pending`` are dropped
+        instead of queued
+    """
+
+    executor = None
+    pending = None
+    lock = threading.Lock()
+
+    def enabled(self):
+        return Config.get("prefetch", "enabled", False) and\
+            Config.get("cache", "enabled", True)
+
+    def _getExecutor(self):
+        with Prefetcher.lock:
+            if Prefetcher.executor is None:
+                Prefetcher.executor = ThreadPoolExecutor(
+                    max_workers=Config.get("prefetch", "max_workers", 4),
+                    initializer=initWorkerConnection
+                )
+                Prefetcher.pending = threading.BoundedSemaphore(
+                    Config.get("prefetch", "max_pending", 16))
+            return Prefetcher.executor
+
+    def prefetchChildren(self, typeName, identifiers):
+        """ Loads the children of all given objects of typeName in the
+            background
+        """
+        if not self.enabled() or typeName not in CHILDREN_GET:
+            return
+
+        executor = self._getExecutor()
+        identifiers = [x for x in identifiers if x and not x.startswith('0.0')]
+        for identifier in identifiers[0:Config.get("prefetch", "max_items", 25)]:
+            if not Prefetcher.pending.acquire(blocking=False):
+                return
+            executor.submit(self._prefetch, typeName, identifier)
+
+    def _prefetch(self, typeName, identifier):
+        try:
+            CHILDREN_GET[typeName](identifier)
+        except Exception as ex:
+            logging.getLogger(__name__).debug(
+                "Prefetch of {} {} failed: {}".format(typeName, identifier, str(ex)))
+        finally:
+            Prefetcher.pending.release()
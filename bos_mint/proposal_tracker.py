@@ -0,0 +1,113 @@
+import time
+import logging
+
+from . import Config, chain_listener
+from .node import Node
+from .background import isLeader
+from .shared_cache import SharedCache
+from .hierarchy_index import getOperationName, getAffectedObjects
+
+WITNESS_ACCOUNT_ID = "1.2.1"
+
+# keys in the shared cache
+OPEN_PROPOSALS = "proposals.open"
+SEEN_PROPOSALS = "proposals.seen"
+LAST_RECONCILIATION = "proposals.last_reconciliation"
+
+
+def changesHierarchy(operations):
+    """ Only proposals that change the sport hierarchy are tracked
+
+        :param operations: operations as [operationId, data]
+    """
+    return any(getAffectedObjects(x) for x in operations)
+
+
+class ProposalTracker(object):
+    """ Keeps the ids and expiration times of the open proposals of the
+        witness account, without loading the proposals themselves.
+
+        New proposals and deletions are taken from the blocks published by
+        the chain listener, expired ones are dropped by block time. Since
+        approvals that execute a proposal can't be told apart cheaply, the
+        ids are reconciled with the chain every
+        ``reconcile_interval_in_seconds``
+    """
+
+    def getOpenProposals(self):
+        """ :returns: dict of proposal id to expiration time """
+        interval = Config.get("proposal_tracker", "reconcile_interval_in_seconds", 60)
+        lastReconciliation = SharedCache().get(LAST_RECONCILIATION)
+        if lastReconciliation is None or time.time() - lastReconciliation > interval:
+            self.reconcile()
+        return SharedCache().get(OPEN_PROPOSALS, {})
+
+    def count(self):
+        return len(self.getOpenProposals())
+
+    def getNewSinceLastSeen(self):
+        seen = SharedCache().get(SEEN_PROPOSALS, [])
+        return [x for x in self.getOpenProposals().keys() if x not in seen]
+
+    def markSeen(self, proposalIds=None):
+        if proposalIds is None:
+            proposalIds = list(self.getOpenProposals().keys())
+        SharedCache().set(SEEN_PROPOSALS, list(proposalIds))
+
+    def reconcile(self, proposals=None):
+        """ Replaces the tracked ids with the proposals on the chain
+
+            :param proposals: proposals if already loaded, otherwise the
+                raw proposals are requested
+            :type proposals: list
+        """
+        try:
+            if proposals is None:
+                proposals = Node().get_node().rpc.get_proposed_transactions(WITNESS_ACCOUNT_ID)
+            SharedCache().set(OPEN_PROPOSALS, {
+                x['id']: x.get('expiration_time') for x in proposals
+                if changesHierarchy(x['proposed_transaction']['operations'])
+            })
+        except Exception as ex:
+            logging.getLogger(__name__).warning("Proposals could not be reconciled: " + str(ex))
+        SharedCache().set(LAST_RECONCILIATION, time.time())
+
+    def applyBlock(self, block):
+        openProposals = SharedCache().get(OPEN_PROPOSALS)
+        if openProposals is None:
+            # not reconciled yet
+            return
+
+        changed = False
+        for transaction in block.get('transactions', []):
+            results = transaction.get('operation_results', [])
+            for idx, operation in enumerate(transaction.get('operations', [])):
+                operationName = getOperationName(operation[0])
+                if operationName == 'proposal_create' and idx < len(results)\
+                        and changesHierarchy(x['op'] for x in operation[1].get('proposed_ops', [])):
+                    openProposals[results[idx][1]] = operation[1].get('expiration_time')
+                    changed = True
+                elif operationName == 'proposal_delete':
+                    openProposals.pop(operation[1]['proposal'], None)
+                    changed = True
+
+        for proposalId, expiration in list(openProposals.items()):
+            if expiration is not None and expiration <= block.get('timestamp'):
+                del openProposals[proposalId]
+                changed = True
+
+        if changed:
+            SharedCache().set(OPEN_PROPOSALS, openProposals)
+
+
+def onChainEvent(eventType, payload):
+    # every worker process listens, but only the leader writes the ids
+    if eventType == "block" and isLeader():
+        if payload["gap"]:
+            # reconciled on the next lookup
+            SharedCache().delete(LAST_RECONCILIATION)
+        else:
+            ProposalTracker().applyBlock(payload["block"])
+
+
+chain_listener.subscribe(onChainEvent)
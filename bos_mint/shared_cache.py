@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from . import Config
+
+
+class LocalBackend(object):
+    """ Cache within this process only """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires and time.time() > expires:
+                del self._data[key]
+                return default
+            return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, json.dumps(value))
+
+    def acquire(self, key, owner, ttl):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and json.loads(entry[1]) != owner and\
+                    (entry[0] is None or time.time() <= entry[0]):
+                return False
+            self._data[key] = (time.time() + ttl, json.dumps(owner))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [x for x in self._data.keys() if x.startswith(prefix)]:
+                del self._data[key]
+
+
+class SqliteBackend(object):
+    """ Cache in a sqlite file that all worker processes on this host share.
+        Deleting an entry invalidates it for all workers
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+
+    def _connection(self):
+        # sqlite connections must not be shared among threads or forked
+        # worker processes
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            "SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] and time.time() > row[1]):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl if ttl else None))
+
+    def acquire(self, key, owner, ttl):
+        connection = self._connection()
+        with connection:
+            # the write lock is taken before reading the current owner
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and json.loads(row[0]) != owner and\
+                    (row[1] is None or time.time() <= row[1]):
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(owner), time.time() + ttl))
+            return True
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+BACKENDS = {
+    "local": lambda: LocalBackend(),
+    "sqlite": lambda: SqliteBackend(
+        Config.get("shared_cache", "path", "{cwd}/bos-mint-cache.db").format(cwd=os.getcwd())),
+}
+
+
+class SharedCache(object):
+    """ Cache for data that all worker processes need, like the menu, the
+        wallet accounts and the dataproxy status. Values must be json
+        serializable. The backend is chosen by ``shared_cache.backend``
+    """
+
+    backend = None
+    lock = threading.Lock()
+
+    def _getBackend(self):
+        with SharedCache.lock:
+            if SharedCache.backend is None:
+                backend = Config.get("shared_cache", "backend", "sqlite")
+                if backend not in BACKENDS:
+                    raise Exception("Unknown shared cache backend " + str(backend))
+                SharedCache.backend = BACKENDS[backend]()
+            return SharedCache.backend
+
+    def get(self, key, default=None):
+        return self._getBackend().get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self._getBackend().set(key, value, ttl)
+
+    def acquire(self, key, owner, ttl):
+        """ Takes or renews a lock that expires after ``ttl`` seconds
+
+            :returns: True if ``owner`` holds the lock
+        """
+        return self._getBackend().acquire(key, owner, ttl)
+
+    def delete(self, key):
+        self._getBackend().delete(key)
+
+    def clear(self, prefix=""):
+        self._getBackend().clear(prefix)
@@ -7,9 +7,14 @@ def findEnglishOrFirst(listOfIStrings, desiredLanguage='en'):
         desiredLanguage, listOfIStrings[0][1])
 
 
-def toString(toBeFormatted, object=None):
-
-    if type(object).__name__ == "Event":
+def toString(toBeFormatted, object=None, className=None):
+    """ :param className: name of the wrapper class, to format an object
+        that isn't wrapped
+    """
+    if className is None and object is not None:
+        className = object.__class__.__name__
+
+    if className == "Event":
         if isinstance(toBeFormatted.get('name'), list):
             name = findEnglishOrFirst(toBeFormatted.get('name'))
         else:
@@ -38,8 +43,8 @@ def toString(toBeFormatted, object=None):
         displayName = name + ' (' + toBeFormatted.get('id') + ')'
     elif toBeFormatted.get('id'):
         displayName = '(' + toBeFormatted.get('id') + ')'
-        if object:
-            displayName = object.__class__.__name__ + " " + displayName
+        if className:
+            displayName = className + " " + displayName
     else:
         raise Exception
 
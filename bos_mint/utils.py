@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
-from flask import redirect, flash, url_for, request, render_template
+from flask import (
+    redirect, flash, url_for, request, render_template, Response,
+    stream_with_context, current_app
+)
 from functools import wraps
 from datetime import datetime
 from peerplaysbase.operationids import getOperationNameForId
 
 from .node import Node, NodeException
 from . import wrapper
+from . import tostring
 from . import config
 from . import datestring
 from .menu_info import getMenuInfo
+from .hierarchy_index import HierarchyIndex
 
 # dictionary to configure types (Sport, EventGroup, etc.)
 #  title: human readable title
@@ -23,53 +28,71 @@ TYPENAMES = {
     'bettingmarketgrouprule': {'title': 'Betting market group rule'}
 }
 
+# get list of objects for typename as returned by the blockchain
+# (answered from the local hierarchy index if enabled)
+TYPE_GET_ALL_RAW = {
+    'sport': lambda unusedId: HierarchyIndex().getAll(
+        'sport', None, lambda unusedId: Node().getSports()),
+    'eventgroup': lambda tmpSportId: HierarchyIndex().getAll(
+        'eventgroup', tmpSportId, Node().getEventGroups),
+    'event': lambda tmpEventGroupId: HierarchyIndex().getAll(
+        'event', tmpEventGroupId, Node().getEvents),
+    'event_status': lambda tmpEventGroupId: HierarchyIndex().getAll(
+        'event', tmpEventGroupId, Node().getEvents),
+    'bettingmarketgroup': lambda tmpEventId: HierarchyIndex().getAll(
+        'bettingmarketgroup', tmpEventId, Node().getBettingMarketGroups),
+    'bettingmarket': lambda tmpBMGId: HierarchyIndex().getAll(
+        'bettingmarket', tmpBMGId, Node().getBettingMarkets),
+    'bettingmarketgrouprule': lambda unusedId: HierarchyIndex().getAll(
+        'bettingmarketgrouprule', None, lambda unusedId: Node().getBettingMarketGroupRules()),
+    'bet': lambda tmpBMGId: [],  # not implemented yet
+}
+
+# wrapper class for typename, adds id, typeName and toString field
+TYPE_WRAPPER = {
+    'sport': wrapper.Sport,
+    'eventgroup': wrapper.EventGroup,
+    'event': wrapper.Event,
+    'event_status': wrapper.Event,
+    'bettingmarketgroup': wrapper.BettingMarketGroup,
+    'bettingmarket': wrapper.BettingMarket,
+    'bettingmarketgrouprule': wrapper.BettingMarketGroupRule,
+}
+
 # get list of objects for typename, containing id, typeName and toString field
 TYPE_GET_ALL = {
-    'sport': lambda unusedId: [
-        wrapper.Sport(**x) for x in Node().getSports()
-    ],
-    'eventgroup': lambda tmpSportId: [
-        wrapper.EventGroup(**x) for x in Node().getEventGroups(tmpSportId)
-    ],
-    'event': lambda tmpEventGroupId: [
-        wrapper.Event(**x) for x in Node().getEvents(tmpEventGroupId)
-    ],
-    'event_status': lambda tmpEventGroupId: [
-        wrapper.Event(**x) for x in Node().getEvents(tmpEventGroupId)
-    ],
-    'bettingmarketgroup': lambda tmpEventId: [
-        wrapper.BettingMarketGroup(**x) for x in Node().getBettingMarketGroups(tmpEventId)
-    ],
-    'bettingmarket': lambda tmpBMGId: [
-        wrapper.BettingMarket(**x) for x in Node().getBettingMarkets(tmpBMGId)
-    ],
-    'bettingmarketgrouprule': lambda unusedId: [
-        wrapper.BettingMarketGroupRule(**x) for x in Node().getBettingMarketGroupRules() if x is not None
-    ],
+    'sport': lambda unusedId: wrapAll('sport', TYPE_GET_ALL_RAW['sport'](unusedId)),
+    'eventgroup': lambda tmpSportId: wrapAll('eventgroup', TYPE_GET_ALL_RAW['eventgroup'](tmpSportId)),
+    'event': lambda tmpEventGroupId: wrapAll('event', TYPE_GET_ALL_RAW['event'](tmpEventGroupId)),
+    'event_status': lambda tmpEventGroupId: wrapAll('event_status', TYPE_GET_ALL_RAW['event_status'](tmpEventGroupId)),
+    'bettingmarketgroup': lambda tmpEventId: wrapAll('bettingmarketgroup', TYPE_GET_ALL_RAW['bettingmarketgroup'](tmpEventId)),
+    'bettingmarket': lambda tmpBMGId: wrapAll('bettingmarket', TYPE_GET_ALL_RAW['bettingmarket'](tmpBMGId)),
+    'bettingmarketgrouprule': lambda unusedId: wrapAll('bettingmarketgrouprule', TYPE_GET_ALL_RAW['bettingmarketgrouprule'](unusedId)),
     'bet': lambda tmpBMGId: [],  # not implemented yet
 }
 
 # get list of objects for typename, containing id, typeName and toString field
+# (answered from the local hierarchy index if enabled)
 TYPE_GET = {
-    'sport': lambda tmpId: Node().getSport(tmpId),
-    'eventgroup': lambda tmpId: Node().getEventGroup(tmpId),
-    'event': lambda tmpId: Node().getEvent(tmpId),
-    'event_status': lambda tmpId: Node().getEvent(tmpId),
-    'bettingmarketgroup': lambda tmpId: Node().getBettingMarketGroup(tmpId),
-    'bettingmarketgrouprule': lambda tmpId: Node().getBettingMarketGroupRule(tmpId),
-    'bettingmarket': lambda tmpId: Node().getBettingMarket(tmpId),
+    'sport': lambda tmpId: HierarchyIndex().get('sport', tmpId, Node().getSport),
+    'eventgroup': lambda tmpId: HierarchyIndex().get('eventgroup', tmpId, Node().getEventGroup),
+    'event': lambda tmpId: HierarchyIndex().get('event', tmpId, Node().getEvent),
+    'event_status': lambda tmpId: HierarchyIndex().get('event', tmpId, Node().getEvent),
+    'bettingmarketgroup': lambda tmpId: HierarchyIndex().get('bettingmarketgroup', tmpId, Node().getBettingMarketGroup),
+    'bettingmarketgrouprule': lambda tmpId: HierarchyIndex().get('bettingmarketgrouprule', tmpId, Node().getBettingMarketGroupRule),
+    'bettingmarket': lambda tmpId: HierarchyIndex().get('bettingmarket', tmpId, Node().getBettingMarket),
     'bet': lambda tmpId: None,  # not implemented yet
 }
 
 # get object for typename, containing id of parent object
 PARENTTYPE_GET = {
     'sport': lambda tmpId: None,
-    'eventgroup': lambda tmpId: Node().getEventGroup(tmpId).sport.identifier,
-    'event': lambda tmpId: Node().getEvent(tmpId).eventgroup.identifier,
-    'event_status': lambda tmpId: Node().getEvent(tmpId).eventgroup.identifier,
-    'bettingmarketgroup': lambda tmpId: Node().getBettingMarketGroup(tmpId).event.identifier,
+    'eventgroup': lambda tmpId: Node().getEventGroup(tmpId)['sport_id'],
+    'event': lambda tmpId: Node().getEvent(tmpId)['event_group_id'],
+    'event_status': lambda tmpId: Node().getEvent(tmpId)['event_group_id'],
+    'bettingmarketgroup': lambda tmpId: Node().getBettingMarketGroup(tmpId)['event_id'],
     'bettingmarketgrouprule': lambda tmpId: None,
-    'bettingmarket': lambda tmpId: Node().getBettingMarket(tmpId).bettingmarketgroup.identifier,
+    'bettingmarket': lambda tmpId: Node().getBettingMarket(tmpId)['group_id'],
     'bet': lambda tmpId: tmpId,
 }
 
@@ -217,6 +240,54 @@ def getComprisedTypesGetter(typeName):
     return doGet
 
 
+def wrapAll(typeName, objects):
+    return [TYPE_WRAPPER[typeName](**x) for x in objects if x is not None]
+
+
+def getSortKey(item, typeName):
+    """ Sorts by the toString field of the wrapped object, without
+        wrapping it
+    """
+    if item.get('toString'):
+        return item['toString']
+    return tostring.toString(item, className=TYPE_WRAPPER[typeName].__name__)
+
+
+def getComprisedTypesPage(typeName, parentId, offset=None, limit=50, selectedId=None):
+    """ Returns one page of the sorted objects of getComprisedTypesGetter.
+        Only the objects on the page are wrapped
+
+        :param offset: index of the first object, if None the page
+            containing selectedId is returned
+        :returns: tuple of page, total number of objects and offset
+    """
+    if (parentId and parentId.startswith('0.0')) or typeName not in TYPE_WRAPPER:
+        chainObjects = []
+    else:
+        chainObjects = [x for x in TYPE_GET_ALL_RAW[typeName](parentId) if x is not None]
+
+    # allow cache to override
+    pending = getTypesFromPendingProposalGetter(typeName)(parentId)
+    pendingIds = set(x['id'] for x in pending)
+    objects = [x for x in chainObjects if x['id'] not in pendingIds] + pending
+    objects.sort(key=lambda x: getSortKey(x, typeName))
+
+    if offset is None:
+        offset = 0
+        if selectedId:
+            for index, item in enumerate(objects):
+                if item['id'] == selectedId:
+                    offset = index - index % limit
+                    break
+    offset = max(0, min(offset, len(objects) - 1))
+
+    page = [
+        x if isinstance(x, wrapper.BlockchainIdentifiable) else TYPE_WRAPPER[typeName](**x)
+        for x in objects[offset:offset + limit]
+    ]
+    return page, len(objects), offset
+
+
 def getTypesFromPendingProposalGetter(typeName):
     def doGet(parentId):
         inBuffer = []
@@ -290,6 +361,22 @@ def render_template_menuinfo(tmpl_name, **kwargs):
     return render_template(tmpl_name, menuInfo=menuInfo, **kwargs)
 
 
+def stream_template_menuinfo(tmpl_name, **kwargs):
+    """
+    Same as render_template_menuinfo, but the response is sent while the
+    template is rendered. Generators passed as arguments are consumed
+    lazily.
+
+    :param tmpl_name: name of the template to be rendered
+    :type tmpl_name: str
+    """
+    menuInfo = getMenuInfo()
+    context = dict(menuInfo=menuInfo, **kwargs)
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(tmpl_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
 def processNextArgument(nextArg, default):
     if not nextArg:
         return url_for(default)
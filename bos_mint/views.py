@@ -10,11 +10,9 @@ from flask import (
 )
 from wtforms import FormField, SubmitField
 from peerplays.exceptions import WalletExists
-import requests
-import re
 
-from . import app, forms, utils, widgets, Config
-from .menu_info import clear_accounts_cache
+from . import app, forms, utils, widgets, incident_store, incident_grouping, Config
+from .menu_info import clear_accounts_cache, refreshMenuInfo
 from .forms import (
     TranslatedFieldForm,
     NewWalletForm,
@@ -32,17 +30,25 @@ from .models import (
 from .node import (
     Node,
     NodeException,
-    BroadcastActiveOperationsExceptions
+    BroadcastActiveOperationsExceptions,
+    NODE_POOL
 )
 from .utils import (
     render_template_menuinfo,
+    stream_template_menuinfo,
     unlocked_wallet_required,
     wallet_required
 )
-from .dataproxy_link.ping import Ping
+from .prefetch import Prefetcher
+from .http_client import HttpClient
+from .beacons import BeaconPoller
+from .witness_health import WitnessHealth, parseBeaconResponse
+from .proposal_tracker import ProposalTracker
+from .cancel_job import CancelJob
 
 import os
 from bos_incidents import factory
+from bos_incidents.format import INCIDENT_CALLS
 from bos_incidents.exceptions import EventNotFoundException,\
     IncidentStorageLostException
 
@@ -50,9 +56,6 @@ from bookiesports import BookieSports
 from strict_rfc3339 import InvalidRFC3339Error
 from bos_mint.istring import InternationalizedString
 from datetime import timedelta
-from bos_incidents.format import get_reconstruct_string
-from time import sleep
-from threading import Thread
 from datetime import datetime
 from peerplays.event import Events
 from peerplays.eventgroup import EventGroup
@@ -165,6 +168,7 @@ def bookiesports_sync():
 def account_select(accountId):
     try:
         accountName = Node().selectAccount(accountId)
+        refreshMenuInfo()
         flash('Account ' + accountName + ' selected!')
     except BroadcastActiveOperationsExceptions as e:
         flash(str(e), category='error')
@@ -185,6 +189,7 @@ def account_add():
         try:
             Node().addAccountToWallet(form.privateKey.data)
             clear_accounts_cache()
+            refreshMenuInfo()
             flash("Key and all underlying registered accounts imported!")
         except Exception as e:
             flash(
@@ -258,12 +263,15 @@ def replay(filter=None, use="mongodb"):
 
     if form.unique_string.data is not None and not form.unique_string.data.strip() == "":
         store = factory.get_incident_storage(use=use)
-        incidents = list(store.get_incidents(filter_dict=dict(
-            unique_string={"$regex": ".*" + form.unique_string.data + ".*"}
-        )))
+        incidents, total = incident_store.searchIncidents(
+            store,
+            form.unique_string.data.strip(),
+            Config.get("incidents", "search_limit", 100))
         if len(formMessages) > 0:
             formMessages.append("")
-        formMessages.append(str(len(incidents)) + " incidents found locally for " + str(form.unique_string.data))
+        formMessages.append(str(total) + " incidents found locally starting with " + str(form.unique_string.data))
+        if total > len(incidents):
+            formMessages.append("Showing the " + str(len(incidents)) + " most recently pushed")
         for _tmp in incidents:
             formMessages.append(" - " + _tmp["unique_string"] + " provider: " + _tmp["provider_info"]["name"])
 
@@ -299,6 +307,15 @@ def mainnet():
     return render_template_menuinfo('generic.html', formMessage=formMessage)
 
 
+@app.route('/connection/stats')
+def connection_stats():
+    return jsonify({
+        "pool": NODE_POOL.enabled(),
+        "nodes": NODE_POOL.stats(),
+        "http": HttpClient().stats()
+    })
+
+
 @app.route('/witnesses')
 @unlocked_wallet_required
 def witnesses():
@@ -307,73 +324,26 @@ def witnesses():
 
     expected_version = Config.get("witnesses_versions", []).copy()
 
-    def _forward_to_beacons():
-        witnesses = Config.get("witnesses")
-        responses = {}
-        threads = []
-        for witness in witnesses:
-            def _call_beacon(_responses, _beacon, _name):
-                try:
-                    response = requests.get(_beacon, timeout=10)
-                    if response.status_code == 200 and response.json() is not None:
-                        _responses[_name] = response.json()
-                    else:
-                        sleep(0.2)
-                        response = requests.get(_beacon, timeout=10)
-                        if response.status_code == 200 and response.json() is not None:
-                            _responses[_name] = response.json()
-                        else:
-                            _responses[_name] = "HTTP response " + str(response.status_code)
-                except Exception as e:
-                    try:
-                        sleep(0.2)
-                        response = requests.get(_beacon, timeout=10)
-                        if response.status_code == 200 and response.json() is not None:
-                            _responses[_name] = response.json()
-                        else:
-                            _responses[_name] = "HTTP response " + str(response.status_code)
-                    except Exception as e:
-                            _responses[_name] = "Errored, " + str(e)
-
-            threads.append(Thread(target=_call_beacon, args=(responses, witness["url"] + "/isalive", witness["name"])))
-            threads[len(threads) - 1].start()
-
-        for i in range(len(threads)):
-            threads[i].join()
-
-        return responses
-
-    responses = _forward_to_beacons()
+    # polled in the background, see BeaconPoller
+    polled = BeaconPoller().getResponses()
+    responses = {name: value["response"] for name, value in polled.items()}
 
     for key, value in responses.items():
         if type(value) == str:
             responses[key] = value
             continue
-        ok = "NA"
-        if value["queue"]["status"].get("default", None) is not None:
-            ok = value["queue"]["status"]["default"]["count"]
-        nok = "NA"
-        if value["queue"]["status"].get("failed", None) is not None:
-            nok = value["queue"]["status"]["failed"]["count"]
-        scheduler = False
-        if (value.get("background", None) is not None and
-                value["background"].get("scheduler", None) is not None and
-                value["background"]["scheduler"].get("running", None) is not None):
-            scheduler = value["background"]["scheduler"]["running"]
+        sample = parseBeaconResponse(value)
+        if sample["error"]:
+            responses[key] = sample["error"]
+            continue
         responses[key] = {
-            "qeue": str(ok) + "/" + str(nok)
+            "qeue": str(sample["ok"] if sample["ok"] is not None else "NA") + "/" +
+            str(sample["failed"] if sample["failed"] is not None else "NA")
         }
-        if not scheduler:
-            responses[key]["scheduler"] = scheduler
-        _version = (
-            value["versions"]["bookiesports"] +
-            "/" + value["versions"]["bos-auto"] +
-            "/" + value["versions"]["bos-sync"] +
-            "/" + value["versions"]["bos-incidents"] +
-            "/" + value["versions"]["peerplays"]
-        )
-        if _version not in expected_version:
-            responses[key]["deviating_versions"] = _version
+        if not sample["scheduler"]:
+            responses[key]["scheduler"] = sample["scheduler"]
+        if sample["version"] not in expected_version:
+            responses[key]["deviating_versions"] = sample["version"]
 
     expected_version.append("<bookiesports>/<bos-auto>/<bos-sync>/<bos-incidents>/<peerplays>")
     responses["<witness_name>"] = {
@@ -383,6 +353,7 @@ def witnesses():
 
     response_dict = {
         "time": str(datetime.now()),
+        "polled": str(datetime.fromtimestamp(min(x["time"] for x in polled.values()))) if polled else None,
         "reponses": responses
     }
 
@@ -395,6 +366,28 @@ def witnesses():
     return render_template_menuinfo('generic.html', preformatted_string=preformatted_string)
 
 
+@app.route('/witnesses/trend')
+@app.route('/witnesses/trend/<witnessName>')
+@unlocked_wallet_required
+def witnesses_trend(witnessName=None):
+    if not Config.get("advanced_features", False):
+        abort(404)
+
+    points = request.args.get("points", 60, type=int)
+    if points < 1:
+        abort(400)
+    since = request.args.get("since", None, type=float)
+    if witnessName is None:
+        witnessNames = WitnessHealth().getWitnessNames()
+    else:
+        witnessNames = [witnessName]
+
+    return jsonify({
+        name: WitnessHealth().getTrend(name, points=points, since=since)
+        for name in witnessNames
+    })
+
+
 @app.route('/cancel')
 @app.route('/cancel/<event_ids>')
 @app.route('/cancel/<event_ids>/<chain>')
@@ -423,7 +416,8 @@ def cancel(event_ids=None, chain=None):
         for event in legacy_events_list:
             legacy_events["all_event_ids"] = legacy_events["event_ids"] + event["id"] + ","
 
-        legacy_events["usage"] = "To cancel a specific event (or several): Dryrun with '/cancel/<comma-separated-list-of-ids>', execute with '/cancel/<comma-separated-list-of-ids>/send'"
+        legacy_events["traversal"] = Node.lastTraversal
+        legacy_events["usage"] = "To cancel a specific event (or several): Dryrun with '/cancel/<comma-separated-list-of-ids>', execute with '/cancel/<comma-separated-list-of-ids>/send'. Both run in the background and redirect to the job status"
 
         preformatted_string = json.dumps(
             legacy_events,
@@ -431,48 +425,27 @@ def cancel(event_ids=None, chain=None):
             indent=4
         )
     else:
-        responses = []
-        urls_to_call = {}
-        for event_id in event_ids.split(","):
-            event = Node().getEvent(event_id)
-            teams = [x[1] for x in event["name"] if x[0] == 'en'][0]
-            if " v " in teams:
-                teams = teams.split(" v ")
-            if " @ " in teams:
-                teams = teams.split(" @ ")
-                teams = [teams[1], teams[0]]
-
-            id_string = event["start_time"] + "Z" \
-                + '__' + [x[1] for x in event.eventgroup.sport["name"] if x[0] == 'en'][0] \
-                + '__' + [x[1] for x in event.eventgroup["name"] if x[0] == 'en'][0] \
-                + '__' + teams[0] \
-                + '__' + teams[1]
-            call = "canceled__None"
-
-            proxies = Ping().get_status()
-
-            for key, value in proxies.items():
-                url = value["replay"] + "&manufacture=" + id_string + "__" + call
-                if chain == "send":
-                    url = re.sub('&only_report=True', '', url)
-                urls_to_call[url] = url
-            for url in urls_to_call.keys():
-                response = requests.get(url, timeout=1000)
-                if response.status_code == 200:
-                    responses.append(requests.get(url, timeout=1000).json())
-
-        preformatted_string = json.dumps(
-            {
-                "responses": responses,
-                "urls_to_call": list(urls_to_call.keys())
-            },
-            sort_keys=True,
-            indent=4
-        )
+        # the dataproxies can take minutes to answer
+        job_id = CancelJob().start(
+            [x.strip() for x in event_ids.split(",") if x.strip()],
+            send=(chain == "send"))
+        return redirect(url_for("cancel_job", job_id=job_id))
 
     return render_template_menuinfo('generic.html', preformatted_string=preformatted_string)
 
 
+@app.route('/cancel/job/<job_id>')
+@unlocked_wallet_required
+def cancel_job(job_id):
+    if not Config.get("advanced_features", False):
+        abort(404)
+
+    job = CancelJob().get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
 @app.route('/incidents')
 @app.route('/incidents/<matching>')
 @app.route('/incidents/<matching>/<use>')
@@ -506,57 +479,52 @@ def show_incidents(from_date=None, to_date=None, matching=None, use="mongodb"):
         if type(to_date) == str:
             to_date = utils.string_to_date(to_date)
 
-    store = None
-    unresolved_events = None
+    limit = Config.get("incidents", "page_size", 50)
+    after = request.args.get("after", None)
+    stream = request.args.get("stream", None) is not None
+    next_url = None
+    first_url = None
     try:
         store = factory.get_incident_storage(use=use)
-        unresolved_events = store.get_events(resolve=False)
+        if stream:
+            # all events within the window, loaded page by page while the
+            # response is sent. The first page is loaded before, so that a
+            # missing store is still reported with a redirect
+            first_page = incident_store.getEventsPage(store, from_date, to_date, matching, after, limit)
+            pages = incident_store.iterEventPages(
+                store, from_date, to_date, matching, after, limit, firstPage=first_page)
+        else:
+            # only events within the window and matching all terms are loaded
+            page, next_cursor = incident_store.getEventsPage(store, from_date, to_date, matching, after, limit)
+            pages = [page]
+            if next_cursor is not None:
+                args = dict(request.args.items())
+                args["after"] = next_cursor
+                args.update(request.view_args)
+                next_url = url_for("show_incidents", **args)
     except IncidentStorageLostException:
         flash("BOS-mint could not find an incident store, or connection failed. Is a BOS-auto instance running alongside that grants access?")
         return redirect(url_for('overview'))
 
-    events = []
-    # resort for provider view
-    for event in unresolved_events:
-        try:
-            event_scheduled = utils.string_to_date(event["id_string"][0:18])
-        except InvalidRFC3339Error:
+    if after is not None:
+        args = dict(request.args.items())
+        args.pop("after")
+        args.update(request.view_args)
+        first_url = url_for("show_incidents", **args)
+
+    events = incident_grouping.iterGroupedEvents(store, pages)
+    stream_errors = []
+    if stream:
+        def reportLostStore(events):
+            # the response has been sent partly, the error is rendered below
+            # the events instead
             try:
-                event_scheduled = utils.string_to_date(event["id_string"][0:20])
-            except InvalidRFC3339Error:
-                event_scheduled = utils.string_to_date(event["id_string"][0:23])
+                for event in events:
+                    yield event
+            except IncidentStorageLostException as ex:
+                stream_errors.append(str(ex) or "Connection to the incident store lost")
 
-        if event_scheduled <= to_date and event_scheduled >= from_date and\
-                (matching is None or all([x.lower() in event["id_string"].lower() for x in matching])):
-            store.resolve_event(event)
-        else:
-            continue
-        for call in ["create", "in_progress", "finish", "result", "dynamic_bmgs", "canceled"]:
-            try:
-                incident_provider_dict = {}
-                for incident in event[call]["incidents"]:
-                    provider = incident["provider_info"]["name"]
-                    try:
-                        incident_dict = incident_provider_dict[provider]
-                    except KeyError:
-                        incident_provider_dict[provider] = {"incidents": [],
-                                                            "replay_links": {}}
-                        incident_dict = incident_provider_dict[provider]
-
-                    incident_provider_dict[provider]["incidents"].append(incident)
-
-                    try:
-                        replay_url = Ping().get_replay_url(provider, incident, call)
-                        if replay_url is not None:
-                            incident_dict["replay_links"][incident["unique_string"]] = replay_url
-                    except Exception as e:
-                        pass
-
-                event[call]["incidents_per_provider"] = incident_provider_dict
-            except KeyError:
-                pass
-        event["reconstruct_string"] = get_reconstruct_string(event["id"])
-        events.append(event)
+        events = reportLostStore(events)
 
     from_date = utils.date_to_string(from_date)
     to_date = utils.date_to_string(to_date)
@@ -567,6 +535,8 @@ def show_incidents(from_date=None, to_date=None, matching=None, use="mongodb"):
     if use == "auto":
         use = "bos-auto"
 
+    if stream:
+        return stream_template_menuinfo('showIncidents.html', **locals())
     return render_template_menuinfo('showIncidents.html', **locals())
 
 
@@ -575,27 +545,37 @@ def show_incidents(from_date=None, to_date=None, matching=None, use="mongodb"):
 def show_incidents_per_id(incident_id=None, call=None, use="mongodb"):
     if use == "bos-auto":
         use = "mongodb"
+    if call not in INCIDENT_CALLS:
+        abort(404)
+
+    # unchanged incidents are confirmed without asking the store
+    etag = incident_store.ETAG_CACHE.get((use, incident_id, call))
+    if etag is not None and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
 
     store = factory.get_incident_storage(use=use)
     try:
-        event = store.get_event_by_id(incident_id, resolve=True)
+        event, etag = incident_store.getEventCall(store, incident_id, call)
     except EventNotFoundException:
         return jsonify("Event not found")
+    incident_store.ETAG_CACHE.set((use, incident_id, call), etag)
 
-    for key in list(event.keys()):
-        if not (key == call or key == "id" or key == "id_string"):
-            event.pop(key)
-
-    return jsonify(event)
+    response = jsonify(event)
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route("/event/incidents/<selectId>", methods=['get'])
 @wallet_required
 def event_incidents(selectId=None):
     event = Node().getEvent(selectId)
+    eventgroup = Node().getEventGroup(event["event_group_id"])
+    sport = Node().getSport(eventgroup["sport_id"])
     incident_id = (event["start_time"] + "Z-" +
-                   InternationalizedString.listToDict(event.eventgroup.sport["name"])["identifier"] + "-" +
-                   InternationalizedString.listToDict(event.eventgroup["name"])["identifier"])
+                   InternationalizedString.listToDict(sport["name"])["identifier"] + "-" +
+                   InternationalizedString.listToDict(eventgroup["name"])["identifier"])
 
     return redirect(url_for("show_incidents", matching=incident_id))
 
@@ -665,13 +645,36 @@ def overview(typeName=None, identifier=None):
                     }]
             return tmpList
 
+        def pageUrl(typeName, offset):
+            args = dict(request.args.items())
+            args[typeName + '_offset'] = offset
+            args.update(request.view_args)
+            return url_for('overview', **args)
+
+        def buildPagination(typeName, offset, limit, total):
+            return {
+                'offset': offset,
+                'limit': limit,
+                'total': total,
+                'previousUrl': pageUrl(typeName, max(0, offset - limit)) if offset > 0 else None,
+                'nextUrl': pageUrl(typeName, offset + limit) if offset + limit < total else None
+            }
+
         def buildChainElement(parentId, typeName):
-            tmpList = utils.getComprisedTypesGetter(typeName)(parentId)
+            # only the visible page of long lists is built
+            limit = Config.get("overview", "page_size", 50)
+            tmpList, total, offset = utils.getComprisedTypesPage(
+                typeName,
+                parentId,
+                offset=request.args.get(typeName + '_offset', None, type=int),
+                limit=limit,
+                selectedId=selected.get(typeName))
             title = utils.getTitle(typeName)
 
             if typeName == 'bettingmarketgroup':
                 return {
                     'list': buildListElements(tmpList),
+                    'pagination': buildPagination(typeName, offset, limit, total),
                     'title': title,
                     'typeName': typeName,
                     'extraLink': [{
@@ -693,6 +696,7 @@ def overview(typeName=None, identifier=None):
             else:
                 return {
                     'list': buildListElements(tmpList),
+                    'pagination': buildPagination(typeName, offset, limit, total),
                     'title': title,
                     'typeName': typeName
                 }
@@ -764,6 +768,11 @@ def overview(typeName=None, identifier=None):
 
         del tmpTypeName, tmpParentIdentifier
 
+        # the next click most likely selects one of the deepest listed objects
+        Prefetcher().prefetchChildren(
+            reverseChain[-1]['typeName'],
+            [x['id'] for x in reverseChain[-1]['list']])
+
         return render_template_menuinfo('index.html', **locals())
     except Exception as e:
         app.logger.exception(e)
@@ -848,6 +857,8 @@ def automatic_approval():
 @app.route("/proposals", methods=['post', 'get'])
 def votable_proposals():
     proposals = Node().getAllProposals()
+    ProposalTracker().reconcile(proposals)
+    ProposalTracker().markSeen([x['id'] for x in proposals])
     if proposals:
         accountId = Node().getSelectedAccount()['id']
 
@@ -110,7 +110,45 @@ class OperationWidget(RenderTemplateWidget):
         self.template_args['operations'].append(ow)
 
 
+WITNESS_ACCOUNT_ID = "1.2.1"
+
+
+def resolveApprovalAccountNames(proposals):
+    """ Collects all accounts that (may) approve the given proposals and
+        resolves their names in one batch. The active authorities of
+        witness-account are resolved as well
+
+        :param proposals: proposals to be rendered
+        :type proposals: list
+        :returns: tuple of names by id and ids of the witness-account authorities
+    """
+    accountIds = set()
+    witnessRequired = False
+    for proposal in proposals:
+        accountIds.update(proposal.get('available_active_approvals') or [])
+        accountIds.update(proposal.get('required_active_approvals') or [])
+        if WITNESS_ACCOUNT_ID in (proposal.get('required_active_approvals') or []):
+            witnessRequired = True
+
+    witnessAuths = []
+    if witnessRequired:
+        # authorities can change, thus witness-account is always loaded
+        for account in Node().getAccountObjects([WITNESS_ACCOUNT_ID]):
+            witnessAuths = [x[0] for x in account["active"]["account_auths"]]
+        accountIds.update(witnessAuths)
+
+    return Node().getAccountNames(accountIds), witnessAuths
+
+
+def accountToString(accountId, accountNames):
+    if accountNames.get(accountId):
+        return tostring.toString({'id': accountId, 'name': accountNames[accountId]})
+    return tostring.toString({'id': accountId})
+
+
 def prepareProposalsDataForRendering(proposals, accountId=None):
+    accountNames, witnessAuths = resolveApprovalAccountNames(proposals)
+
     tmpList = []
     for proposal in proposals:
         # ensure the parent expiration time is the shortest time
@@ -124,21 +162,16 @@ def prepareProposalsDataForRendering(proposals, accountId=None):
             tmpListItems.append(('Review period time', proposal['review_period_time']))
         if proposal.get('available_active_approvals'):
             tmpListItems.append(('Available active approvals', [
-                tostring.toString(x) for x in Node().getAccounts(proposal['available_active_approvals'])]))
+                accountToString(x, accountNames) for x in proposal['available_active_approvals']]))
         if proposal.get('required_active_approvals'):
-            approvalAccounts = Node().getAccounts(proposal['required_active_approvals'])
             # special handling for witness account
             accountList = []
-            for account in approvalAccounts:
-                if account["id"] == "1.2.1":
-                    for authAccount in account["active"]["account_auths"]:
-                        accountList.append(
-                            tostring.toString(
-                                Node().getAccount(authAccount[0])
-                            )
-                        )
+            for approvalId in proposal['required_active_approvals']:
+                if approvalId == WITNESS_ACCOUNT_ID:
+                    for authAccountId in witnessAuths:
+                        accountList.append(accountToString(authAccountId, accountNames))
                 else:
-                    accountList.append(tostring.toString(x))
+                    accountList.append(accountToString(approvalId, accountNames))
 
             tmpListItems.append(('Required approvals', accountList))
 
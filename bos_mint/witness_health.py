@@ -0,0 +1,100 @@
+import time
+import logging
+
+from sqlalchemy import func
+
+from . import app, db, Config
+from .models import WitnessSample
+
+VERSION_PACKAGES = ["bookiesports", "bos-auto", "bos-sync", "bos-incidents", "peerplays"]
+
+
+def parseBeaconResponse(response):
+    """ Extracts queue counts, scheduler state and versions from the json
+        body of a witness beacon
+
+        :param response: json body, or error message if the beacon failed
+        :returns: dict with ok, failed, scheduler, version and error
+    """
+    sample = {"ok": None, "failed": None, "scheduler": None, "version": None, "error": None}
+    if type(response) == str:
+        sample["error"] = response
+        return sample
+
+    try:
+        status = response["queue"]["status"]
+        if status.get("default", None) is not None:
+            sample["ok"] = status["default"]["count"]
+        if status.get("failed", None) is not None:
+            sample["failed"] = status["failed"]["count"]
+        sample["scheduler"] = False
+        if (response.get("background", None) is not None and
+                response["background"].get("scheduler", None) is not None and
+                response["background"]["scheduler"].get("running", None) is not None):
+            sample["scheduler"] = response["background"]["scheduler"]["running"]
+        sample["version"] = "/".join(response["versions"][x] for x in VERSION_PACKAGES)
+    except (KeyError, TypeError, AttributeError) as ex:
+        sample["error"] = "Unexpected beacon response: " + str(ex)
+    return sample
+
+
+class WitnessHealth(object):
+    """ Keeps the last ``samples_per_witness`` beacon samples of every
+        witness in the local database, the oldest sample is overwritten
+    """
+
+    def record(self, responses):
+        """ :param responses: dict of witness name to dict with
+                ``response`` and ``time``, see BeaconPoller
+        """
+        size = Config.get("witness_health", "samples_per_witness", 1440)
+        with app.app_context():
+            try:
+                for name, value in responses.items():
+                    sequence = (db.session.query(func.max(WitnessSample.sequence))
+                                .filter_by(witnessName=name).scalar() or 0) + 1
+                    sample = parseBeaconResponse(value["response"])
+                    db.session.merge(WitnessSample(
+                        witnessName=name,
+                        slot=sequence % size,
+                        sequence=sequence,
+                        time=value["time"],
+                        ok=sample["ok"],
+                        failed=sample["failed"],
+                        scheduler=sample["scheduler"],
+                        version=sample["version"],
+                        error=(sample["error"] or "")[0:256] or None
+                    ))
+                db.session.commit()
+            except Exception as ex:
+                db.session.rollback()
+                logging.getLogger(__name__).warning("Witness samples could not be stored: " + str(ex))
+
+    def getWitnessNames(self):
+        return [x[0] for x in db.session.query(WitnessSample.witnessName).distinct().all()]
+
+    def getTrend(self, witnessName, points=60, since=None):
+        """ Returns the samples of a witness downsampled to at most
+            ``points`` buckets. Per bucket the queue counts are averaged,
+            scheduler and version are taken from the latest sample
+        """
+        query = WitnessSample.query.filter_by(witnessName=witnessName)
+        if since is not None:
+            query = query.filter(WitnessSample.time >= since)
+        samples = query.order_by(WitnessSample.sequence).all()
+
+        bucketSize = max(1, -(-len(samples) // max(1, points)))
+        trend = []
+        for start in range(0, len(samples), bucketSize):
+            bucket = samples[start:start + bucketSize]
+            ok = [x.ok for x in bucket if x.ok is not None]
+            failed = [x.failed for x in bucket if x.failed is not None]
+            trend.append({
+                "time": bucket[-1].time,
+                "ok": sum(ok) / len(ok) if ok else None,
+                "failed": sum(failed) / len(failed) if failed else None,
+                "scheduler": bucket[-1].scheduler,
+                "version": bucket[-1].version,
+                "errors": len([x for x in bucket if x.error])
+            })
+        return trend
@@ -0,0 +1,92 @@
+import os
+import time
+import tempfile
+import unittest
+
+from bos_mint.cache import ObjectCache
+from bos_mint.shared_cache import LocalBackend, SqliteBackend
+
+
+class Test(unittest.TestCase):
+
+    def testGetSet(self):
+        cache = ObjectCache(max_size=10, ttl=60)
+        cache.set("1.22.1", {"id": "1.22.1"})
+
+        self.assertEqual(cache.get("1.22.1"), {"id": "1.22.1"})
+        self.assertIsNone(cache.get("1.22.2"))
+        self.assertTrue("1.22.1" in cache)
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        cache = ObjectCache(max_size=2, ttl=60)
+        cache.set("1.22.1", 1)
+        cache.set("1.22.2", 2)
+        # touch the first one, the second is now least recently used
+        cache.get("1.22.1")
+        cache.set("1.22.3", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("1.22.1"), 1)
+        self.assertIsNone(cache.get("1.22.2"))
+        self.assertEqual(cache.get("1.22.3"), 3)
+
+    def testExpiry(self):
+        cache = ObjectCache(max_size=10, ttl=0.1)
+        cache.set("1.22.1", 1)
+        time.sleep(0.2)
+
+        self.assertIsNone(cache.get("1.22.1"))
+        self.assertEqual(len(cache), 0)
+
+    def testInvalidate(self):
+        cache = ObjectCache(max_size=10, ttl=60)
+        cache.set("1.22.1", 1)
+        cache.set("1.22.2", 2)
+
+        cache.invalidate("1.22.1")
+        self.assertIsNone(cache.get("1.22.1"))
+        self.assertEqual(cache.get("1.22.2"), 2)
+
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+
+class TestSharedCache(unittest.TestCase):
+
+    def assertBackend(self, backend):
+        backend.set("menu.accounts", [{"id": "1.2.7"}])
+        backend.set("menu.versions", {}, ttl=0.1)
+        backend.set("dataproxy_link.status", {})
+        self.assertEqual(backend.get("menu.accounts"), [{"id": "1.2.7"}])
+
+        time.sleep(0.2)
+        self.assertIsNone(backend.get("menu.versions"))
+
+        backend.clear("menu.")
+        self.assertIsNone(backend.get("menu.accounts"))
+        self.assertEqual(backend.get("dataproxy_link.status"), {})
+
+    def assertLock(self, backend):
+        self.assertTrue(backend.acquire("background.leader", 1, 0.2))
+        # renewed by the owner only
+        self.assertTrue(backend.acquire("background.leader", 1, 0.2))
+        self.assertFalse(backend.acquire("background.leader", 2, 0.2))
+
+        time.sleep(0.3)
+        self.assertTrue(backend.acquire("background.leader", 2, 0.2))
+        self.assertFalse(backend.acquire("background.leader", 1, 0.2))
+
+    def testLocal(self):
+        self.assertBackend(LocalBackend())
+        self.assertLock(LocalBackend())
+
+    def testSqliteIsSharedAmongInstances(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        self.assertBackend(SqliteBackend(path))
+
+        SqliteBackend(path).set("menu.accounts", [])
+        self.assertEqual(SqliteBackend(path).get("menu.accounts"), [])
+
+    def testSqliteLock(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        self.assertLock(SqliteBackend(path))
@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+
+from bos_mint import Config
+from bos_mint import cancel_job
+from bos_mint.cancel_job import CancelJob
+
+OBJECTS = {
+    "1.22.1": {"id": "1.22.1", "event_group_id": "1.21.1", "start_time": "2018-01-01T12:00:00",
+               "name": [["en", "Home v Away"]]},
+    "1.21.1": {"id": "1.21.1", "sport_id": "1.20.1", "name": [["en", "League"]]},
+    "1.20.1": {"id": "1.20.1", "name": [["en", "Sport"]]},
+}
+
+PROXIES = {
+    "proxy": {"replay": "http://proxy/replay?restrict_witness_group=bos&only_report=True"}
+}
+
+
+class FakeNode(object):
+
+    def getObjects(self, idList):
+        return {x: OBJECTS[x] for x in idList if x in OBJECTS}
+
+
+class FakeResponse(object):
+
+    status_code = 200
+
+    def __init__(self, url):
+        self.url = url
+
+    def json(self):
+        return {"url": self.url}
+
+
+class FakeHttpClient(object):
+
+    def get(self, url, **kwargs):
+        if "fail" in url:
+            raise IOError("timed out")
+        return FakeResponse(url)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.stored = []
+        self.proxies = PROXIES
+        for patcher in [
+                mock.patch.object(Config, "get", side_effect=lambda *args: args[-1]),
+                mock.patch.object(cancel_job, "Node", FakeNode),
+                mock.patch.object(cancel_job, "HttpClient", FakeHttpClient),
+                mock.patch.object(cancel_job.Ping, "get_status", side_effect=lambda: self.proxies),
+                mock.patch.object(CancelJob, "_store", side_effect=self.store)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def store(self, job):
+        self.stored.append(job["status"])
+
+    def getJob(self, eventIds, send=False):
+        return {
+            "id": "job", "status": "queued", "event_ids": eventIds, "send": send,
+            "finished": None, "progress": {"done": 0, "total": None},
+            "urls_to_call": [], "responses": [], "errors": []
+        }
+
+    def testDone(self):
+        job = self.getJob(["1.22.1"], send=True)
+        CancelJob().run(job)
+
+        url = "http://proxy/replay?restrict_witness_group=bos" \
+            "&manufacture=2018-01-01T12:00:00Z__Sport__League__Home__Away__canceled__None"
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["urls_to_call"], [url])
+        self.assertEqual(job["responses"], [{"url": url}])
+        self.assertEqual(job["progress"], {"done": 1, "total": 1})
+        self.assertEqual(job["errors"], [])
+        self.assertIsNotNone(job["finished"])
+        self.assertEqual(self.stored[0], "running")
+        self.assertEqual(self.stored[-1], "done")
+
+    def testUnresolvedEventIsReported(self):
+        job = self.getJob(["1.22.1", "1.22.2"])
+        CancelJob().run(job)
+
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(len(job["urls_to_call"]), 1)
+        self.assertEqual(len(job["errors"]), 1)
+        self.assertTrue(job["errors"][0].startswith("1.22.2"))
+
+    def testFailedUrlIsReported(self):
+        self.proxies = {
+            "proxy": PROXIES["proxy"],
+            "other": {"replay": "http://fail/replay?only_report=True"}
+        }
+        job = self.getJob(["1.22.1"])
+        CancelJob().run(job)
+
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["progress"], {"done": 2, "total": 2})
+        self.assertEqual(len(job["responses"]), 1)
+        self.assertEqual(len(job["errors"]), 1)
+        self.assertTrue(job["errors"][0].startswith("http://fail"))
+
+    def testMissingDataproxyStatusFails(self):
+        self.proxies = {}
+        job = self.getJob(["1.22.1"])
+        CancelJob().run(job)
+
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["urls_to_call"], [])
+        self.assertTrue(job["errors"][0].startswith("No dataproxy status known"))
+        self.assertEqual(self.stored[-1], "failed")
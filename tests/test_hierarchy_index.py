@@ -0,0 +1,175 @@
+import json
+import unittest
+from unittest import mock
+
+from peerplaysbase.operationids import operations
+
+from bos_mint import app, db
+from bos_mint.models import IndexedObject, IndexedList, IndexedProposal
+from bos_mint.hierarchy_index import HierarchyIndex, getAffectedObjects
+
+
+def getOperation(operationName, **data):
+    return [operations[operationName], data]
+
+
+def getProposal(expiration, *proposedOperations):
+    return getOperation(
+        "proposal_create",
+        expiration_time=expiration,
+        proposed_ops=[{"op": x} for x in proposedOperations])
+
+
+def getBlock(timestamp, *operationsAndResults):
+    return {
+        "timestamp": timestamp,
+        "transactions": [{
+            "operations": [x[0] for x in operationsAndResults],
+            "operation_results": [[1, x[1]] for x in operationsAndResults]
+        }]
+    }
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the tests must not touch the configured database
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite://"
+
+    def setUp(self):
+        context = app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        db.create_all()
+        self.addCleanup(db.drop_all)
+        self.addCleanup(db.session.remove)
+
+        # event group 1.21.1 with the events 1.22.1 and 1.22.2, the first one
+        # has a betting market group with a betting market
+        self.index("eventgroup", "1.21.1", "1.20.1")
+        self.index("event", "1.22.1", "1.21.1")
+        self.index("event", "1.22.2", "1.21.1")
+        self.index("bettingmarketgroup", "1.24.1", "1.22.1")
+        self.index("bettingmarket", "1.25.1", "1.24.1")
+        self.index("event", "1.22.3", "1.21.2")
+        db.session.commit()
+
+    def index(self, typeName, identifier, parentId):
+        db.session.merge(IndexedObject(identifier=identifier, typeName=typeName, parentId=parentId, data="{}"))
+        db.session.merge(IndexedList(typeName=typeName, parentId=parentId))
+
+    def getIndexed(self):
+        return sorted(x.identifier for x in IndexedObject.query.all())
+
+    def getLists(self):
+        return sorted((x.typeName, x.parentId) for x in IndexedList.query.all())
+
+    def applyBlock(self, block, rpc=None):
+        HierarchyIndex().applyBlock(block, rpc or mock.Mock())
+        db.session.commit()
+
+    def testGetAffectedObjects(self):
+        self.assertEqual(
+            getAffectedObjects(getOperation("event_create", event_group_id="1.21.1")),
+            [["event", None, "1.21.1"]])
+        self.assertEqual(
+            getAffectedObjects(getOperation("event_update", event_id="1.22.1", new_event_group_id="1.21.2")),
+            [["event", "1.22.1", "1.21.2"]])
+        self.assertEqual(
+            getAffectedObjects(getProposal(
+                "2018-01-02T00:00:00",
+                getOperation("event_update", event_id="1.22.1"),
+                getOperation("betting_market_group_create", event_id="0.0.0"))),
+            [["event", "1.22.1", None], ["bettingmarketgroup", None, "0.0.0"]])
+        self.assertEqual(getAffectedObjects(getOperation("transfer")), [])
+
+    def testCreate(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getOperation("event_create", event_group_id="1.21.1"), "1.22.4")))
+
+        # only the list the new event belongs to is reloaded
+        self.assertNotIn(("event", "1.21.1"), self.getLists())
+        self.assertIn(("event", "1.21.2"), self.getLists())
+        self.assertEqual(self.getIndexed(), ["1.21.1", "1.22.1", "1.22.2", "1.22.3", "1.24.1", "1.25.1"])
+
+    def testCreateBelowRelativeParent(self):
+        HierarchyIndex().invalidate([["event", None, "0.0.0"]])
+
+        self.assertEqual(
+            self.getLists(),
+            [("bettingmarket", "1.24.1"), ("bettingmarketgroup", "1.22.1"), ("eventgroup", "1.20.1")])
+
+    def testUpdateDropsSubtree(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getOperation("event_update", event_id="1.22.1"), None)))
+
+        self.assertEqual(self.getIndexed(), ["1.21.1", "1.22.2", "1.22.3"])
+        self.assertEqual(
+            self.getLists(),
+            [("event", "1.21.2"), ("eventgroup", "1.20.1")])
+
+    def testRelocateEvent(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getOperation("event_update", event_id="1.22.2", new_event_group_id="1.21.2"), None)))
+
+        # the lists of the old and the new event group are reloaded
+        self.assertEqual(self.getIndexed(), ["1.21.1", "1.22.1", "1.22.3", "1.24.1", "1.25.1"])
+        self.assertNotIn(("event", "1.21.1"), self.getLists())
+        self.assertNotIn(("event", "1.21.2"), self.getLists())
+
+    def testRelocateBettingMarketGroup(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getOperation("betting_market_group_update",
+                          betting_market_group_id="1.24.1", new_event_id="1.22.2"), None)))
+
+        self.assertEqual(self.getIndexed(), ["1.21.1", "1.22.1", "1.22.2", "1.22.3"])
+        self.assertEqual(
+            self.getLists(),
+            [("event", "1.21.1"), ("event", "1.21.2"), ("eventgroup", "1.20.1")])
+
+    def testProposalIsAppliedOnExpiration(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getProposal("2018-01-02T00:00:00", getOperation("event_update", event_id="1.22.2")), "1.10.1")))
+
+        # nothing changes until the proposal is executed
+        self.assertEqual(len(self.getIndexed()), 6)
+        self.assertEqual(
+            json.loads(IndexedProposal.query.get("1.10.1").affected),
+            [["event", "1.22.2", None]])
+
+        self.applyBlock(getBlock("2018-01-02T00:00:00"))
+
+        self.assertNotIn("1.22.2", self.getIndexed())
+        self.assertIsNone(IndexedProposal.query.get("1.10.1"))
+
+    def testProposalIsAppliedOnApproval(self):
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getProposal("2018-01-02T00:00:00", getOperation("event_update", event_id="1.22.2")), "1.10.1")))
+        rpc = mock.Mock()
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:03",
+            (getOperation("proposal_update", proposal="1.10.1"), None)), rpc)
+
+        self.assertNotIn("1.22.2", self.getIndexed())
+        rpc.get_objects.assert_not_called()
+
+    def testUnknownProposalIsLoaded(self):
+        rpc = mock.Mock()
+        rpc.get_objects.return_value = [{
+            "id": "1.10.1",
+            "expiration_time": "2018-01-02T00:00:00",
+            "proposed_transaction": {"operations": [getOperation("event_update", event_id="1.22.2")]}
+        }]
+        self.applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getOperation("proposal_update", proposal="1.10.1"), None)), rpc)
+
+        self.assertNotIn("1.22.2", self.getIndexed())
+        self.assertIsNotNone(IndexedProposal.query.get("1.10.1"))
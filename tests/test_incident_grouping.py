@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+
+from bos_mint import incident_grouping
+from bos_mint.cache import ObjectCache
+from bos_mint.dataproxy_link.ping import Ping
+
+INCIDENT_ID = {
+    "start_time": "2018-05-20T13:00:00Z", "sport": "Soccer",
+    "event_group_name": "EPL", "home": "Chelsea", "away": "Arsenal"
+}
+
+
+def getIncident(reference):
+    return {
+        "_id": reference, "id_string": "a", "call": "create", "id": INCIDENT_ID,
+        "unique_string": str(reference), "provider_info": {"name": "provider"}
+    }
+
+
+class FakeIncidentCollection(object):
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = 0
+
+    def find(self, incidentFilter, projection=None):
+        self.queries += 1
+        return [dict(x) for x in self.documents if x["_id"] in incidentFilter["_id"]["$in"]]
+
+
+class FakeStore(object):
+
+    def __init__(self, incidents):
+        self.incidentCollection = FakeIncidentCollection(incidents)
+
+    def _get_collection(self, database_name=None, collection_name=None):
+        if database_name is not None or collection_name != "incident":
+            raise Exception("Unknown collection " + str(collection_name))
+        return self.incidentCollection
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.prefixes = {"provider": "http://proxy/replay?name_filter="}
+        for patcher in [
+                mock.patch.object(incident_grouping, "GROUPING_CACHE", ObjectCache(max_size=10, ttl=60)),
+                mock.patch.object(Ping, "get_replay_url_prefixes", side_effect=lambda: dict(self.prefixes))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.store = FakeStore([getIncident(1), getIncident(2)])
+
+    def group(self, references):
+        event = {"id_string": "a", "create": {"incidents": list(references), "status": {"name": "done"}}}
+        return list(incident_grouping.iterGroupedEvents(self.store, [[event]]))[0]
+
+    def getReplayLinks(self, event):
+        return event["create"]["incidents_per_provider"]["provider"]["replay_links"]
+
+    def testUnchangedEventIsCached(self):
+        first = self.group([1])
+        second = self.group([1])
+
+        self.assertEqual(self.store.incidentCollection.queries, 1)
+        self.assertEqual(second["create"], first["create"])
+        self.assertEqual(second["reconstruct_string"], first["reconstruct_string"])
+        self.assertEqual(second["id"], INCIDENT_ID)
+
+    def testNewIncidentRegroups(self):
+        self.group([1])
+        event = self.group([1, 2])
+
+        self.assertEqual(self.store.incidentCollection.queries, 2)
+        self.assertEqual(len(event["create"]["incidents_per_provider"]["provider"]["incidents"]), 2)
+
+    def testProxyChangeRegroups(self):
+        self.group([1])
+        self.prefixes = {"provider": "http://other/replay?name_filter="}
+        event = self.group([1])
+
+        self.assertEqual(self.store.incidentCollection.queries, 2)
+        self.assertEqual(self.getReplayLinks(event), {"1": "http://other/replay?name_filter=1,create"})
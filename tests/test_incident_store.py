@@ -0,0 +1,203 @@
+import unittest
+from unittest import mock
+from datetime import datetime, timezone
+
+from bos_mint.incident_store import (
+    ensureIndexes, filterByScheduledTime, getCallETag, getEventFilter, getEventsPage,
+    getScheduledTime, resolveEvents, searchIncidents
+)
+
+
+class Test(unittest.TestCase):
+
+    def testScheduledTime(self):
+        self.assertEqual(
+            getScheduledTime("2018-05-20t130000z__soccer__epl__chelsea__arsenal"),
+            getScheduledTime("2018-05-20t13:00:00z__soccer__epl__chelsea__arsenal"))
+
+    def testFilterByScheduledTime(self):
+        events = [
+            {"id_string": "2018-05-20t120000z__soccer__epl__home__away"},
+            {"id_string": "2018-05-20t13:00:00z__soccer__epl__home__away"},
+            {"id_string": "2018-05-20t140000z__soccer__epl__home__away"},
+        ]
+        self.assertEqual(
+            filterByScheduledTime(
+                events,
+                datetime(2018, 5, 20, 13, tzinfo=timezone.utc),
+                datetime(2018, 5, 20, 14, tzinfo=timezone.utc)),
+            events[1:3])
+
+    def testFilterByDayAndTerms(self):
+        eventFilter = getEventFilter(
+            datetime(2018, 5, 18, 13),
+            datetime(2018, 5, 20, 13),
+            ["Soccer", "a.b"])
+
+        self.assertEqual(eventFilter, {"$and": [
+            {"id_string": {"$gte": "2018-05-18", "$lt": "2018-05-20~"}},
+            {"id_string": {"$regex": "Soccer", "$options": "i"}},
+            {"id_string": {"$regex": "a\\.b", "$options": "i"}},
+        ]})
+
+    def testNoFilter(self):
+        self.assertEqual(getEventFilter(), {})
+
+    @mock.patch("bos_mint.incident_store.INDEXED_COLLECTIONS", set())
+    def testEnsureIndexes(self):
+        store = FakeStore([])
+        ensureIndexes(store)
+        ensureIndexes(store)
+
+        self.assertEqual(store.collection.indexes, ["id_string"])
+
+    def testEventsPage(self):
+        events = [
+            {"id_string": "2018-05-2" + str(day) + "t130000z__soccer__epl__home__away"}
+            for day in range(4, -1, -1)
+        ]
+        store = FakeStore(events)
+
+        page, cursor = getEventsPage(store, limit=2)
+        self.assertEqual(page, events[0:2])
+        self.assertEqual(cursor, events[1]["id_string"])
+
+        page, cursor = getEventsPage(store, after=cursor, limit=2)
+        self.assertEqual(page, events[2:4])
+
+        page, cursor = getEventsPage(store, after=cursor, limit=2)
+        self.assertEqual(page, events[4:5])
+        self.assertIsNone(cursor)
+
+    def testResolveEvents(self):
+        incidents = [
+            {"_id": 1, "id_string": "a", "call": "create", "id": {"home": "x"}, "unique_string": "1"},
+            {"_id": 2, "id_string": "a", "call": "result", "id": {"home": "x"}, "unique_string": "2"},
+            {"_id": 3, "id_string": "b", "call": "create", "id": {"home": "y"}, "unique_string": "3"},
+        ]
+        events = [
+            {"id_string": "a", "create": {"incidents": [1]}, "result": {"incidents": [2, 4]}},
+            {"id_string": "b", "create": {"incidents": [3]}},
+        ]
+        store = FakeStore([], incidents)
+
+        resolveEvents(store, events)
+
+        self.assertEqual(store.incidentCollection.queries, 1)
+        self.assertEqual(events[0]["id"], {"home": "x"})
+        self.assertEqual(events[0]["create"]["incidents"], [{"unique_string": "1"}])
+        self.assertEqual(events[0]["result"]["incidents"], [{"unique_string": "2"}])
+        self.assertEqual(events[1]["create"]["incidents"], [{"unique_string": "3"}])
+
+    def testSearchIncidents(self):
+        incidents = [
+            {"unique_string": "2018-05-20t130000z-a.b-" + str(i),
+             "provider_info": {"pushed": "2018-05-20T1" + str(i) + ":00:00Z"}}
+            for i in range(0, 3)
+        ]
+        store = FakeStore([], incidents)
+
+        found, total = searchIncidents(store, "2018-05-20t130000z-a.b", limit=2)
+
+        self.assertEqual(store.incidentCollection.lastQuery,
+                         {"unique_string": {"$regex": "^2018\\-05\\-20t130000z\\-a\\.b"}})
+        self.assertEqual(found, [incidents[2], incidents[1]])
+        self.assertEqual(total, 3)
+
+    def testCallETag(self):
+        event = {"id_string": "a", "create": {"incidents": [1], "status": {"name": "unknown"}}}
+        etag = getCallETag(event, "create")
+        self.assertEqual(etag, getCallETag(event, "create"))
+        self.assertNotEqual(etag, getCallETag(event, "result"))
+
+        event["create"]["incidents"].append(2)
+        self.assertNotEqual(etag, getCallETag(event, "create"))
+        newEtag = getCallETag(event, "create")
+
+        event["create"]["status"]["name"] = "done"
+        self.assertNotEqual(newEtag, getCallETag(event, "create"))
+
+
+class FakeIncidentCollection(object):
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = 0
+        self.lastQuery = None
+
+    def find(self, incidentFilter, projection=None):
+        self.queries += 1
+        self.lastQuery = incidentFilter
+        if "_id" in incidentFilter:
+            return [dict(x) for x in self.documents if x["_id"] in incidentFilter["_id"]["$in"]]
+        return FakeCursor(self.documents)
+
+    def count_documents(self, incidentFilter):
+        return len(self.documents)
+
+
+class FakeCursor(object):
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(
+            self.documents, key=lambda x: x["provider_info"]["pushed"], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[0:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+
+class FakeCollection(object):
+    """ Supports the subset of pymongo used by getEventsPage """
+
+    full_name = "test.event"
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.after = None
+        self.count = None
+        self.indexes = []
+
+    def create_index(self, key):
+        self.indexes.append(key)
+
+    def find(self, eventFilter, projection=None):
+        for condition in eventFilter.get("$and", []):
+            if "$lt" in condition.get("id_string", {}):
+                self.after = condition["id_string"]["$lt"]
+        return self
+
+    def sort(self, key, direction):
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def __iter__(self):
+        documents = sorted(self.documents, key=lambda x: x["id_string"], reverse=True)
+        documents = [x for x in documents if self.after is None or x["id_string"] < self.after]
+        return iter(documents[0:self.count])
+
+
+class FakeStore(object):
+
+    def __init__(self, documents, incidents=None):
+        self.collection = FakeCollection(documents)
+        self.incidentCollection = FakeIncidentCollection(incidents or [])
+
+    def _get_collection(self, database_name=None, collection_name=None):
+        # same signature as MongoDBStorage, only the default database is used
+        if database_name is not None:
+            raise Exception("Unknown database " + database_name)
+        if collection_name == "incident":
+            return self.incidentCollection
+        self.collection.after = None
+        return self.collection
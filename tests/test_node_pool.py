@@ -0,0 +1,170 @@
+import time
+import unittest
+from unittest import mock
+
+from bos_mint import Config
+from bos_mint.node_pool import Endpoint, NodePool
+
+POOL_CONFIG = {
+    "latency_smoothing": 0.3,
+    "eject_after_seconds": 0.2,
+    "cooldown_in_seconds": 30,
+    "max_workers": 4,
+}
+
+
+def getConfig(*args):
+    if args[0] == "node_pool" and args[1] in POOL_CONFIG:
+        return POOL_CONFIG[args[1]]
+    return args[-1]
+
+
+class FakeRpc(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeInstance(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.rpc = FakeRpc()
+
+
+class FakeEndpoint(Endpoint):
+
+    def __init__(self, url, latency=None):
+        super(FakeEndpoint, self).__init__(url, {})
+        self.latency = latency
+
+    def connect(self):
+        if self.instance is None:
+            self.instance = FakeInstance(self.url)
+        return self.instance
+
+
+class ConnectionRefusedError(Exception):
+    pass
+
+
+def getPool(*endpoints):
+    pool = NodePool()
+    pool.endpoints = list(endpoints)
+    return pool
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(Config, "get", side_effect=getConfig)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testRoutesToLowestLatency(self):
+        pool = getPool(FakeEndpoint("ws://slow", 0.5), FakeEndpoint("ws://fast", 0.1))
+
+        self.assertEqual(pool.call(lambda instance: instance.url), "ws://fast")
+
+    def testUnmeasuredNodeIsTriedFirst(self):
+        pool = getPool(FakeEndpoint("ws://fast", 0.1), FakeEndpoint("ws://new"))
+
+        self.assertEqual(pool.call(lambda instance: instance.url), "ws://new")
+        self.assertIsNotNone(pool.endpoints[1].latency)
+
+    def testFailoverOnConnectionError(self):
+        failing = FakeEndpoint("ws://failing", 0.1)
+        pool = getPool(failing, FakeEndpoint("ws://other", 0.2))
+
+        def lookup(instance):
+            if instance.url == "ws://failing":
+                raise ConnectionRefusedError("refused")
+            return instance.url
+
+        rpc = failing.connect().rpc
+        self.assertEqual(pool.call(lookup), "ws://other")
+        self.assertFalse(failing.isHealthy())
+        self.assertEqual(failing.ejections, 1)
+        # the websocket of the ejected node is closed
+        self.assertTrue(rpc.closed)
+        self.assertIsNone(failing.instance)
+
+    def testOtherErrorsAreNotRetried(self):
+        first = FakeEndpoint("ws://first", 0.1)
+        pool = getPool(first, FakeEndpoint("ws://second", 0.2))
+        calls = []
+
+        def lookup(instance):
+            calls.append(instance.url)
+            raise KeyError("1.22.1")
+
+        self.assertRaises(KeyError, pool.call, lookup)
+        self.assertEqual(calls, ["ws://first"])
+        self.assertTrue(first.isHealthy())
+
+    def testLastErrorIsRaisedWithoutFurtherNodes(self):
+        # after the failure the only node left is the one already tried
+        pool = getPool(FakeEndpoint("ws://failing", 0.1))
+
+        def lookup(instance):
+            raise ConnectionRefusedError(instance.url)
+
+        with self.assertRaises(ConnectionRefusedError) as context:
+            pool.call(lookup)
+        self.assertEqual(str(context.exception), "ws://failing")
+        self.assertFalse(pool.endpoints[0].lock.locked())
+
+    def testSecondFailureIsRaised(self):
+        pool = getPool(FakeEndpoint("ws://first", 0.1), FakeEndpoint("ws://second", 0.2))
+
+        def lookup(instance):
+            raise ConnectionRefusedError(instance.url)
+
+        with self.assertRaises(ConnectionRefusedError) as context:
+            pool.call(lookup)
+        self.assertEqual(str(context.exception), "ws://second")
+        self.assertFalse(any(x.isHealthy() for x in pool.endpoints))
+
+    def testStalledNodeIsEjected(self):
+        stalled = FakeEndpoint("ws://stalled", 0.1)
+        pool = getPool(stalled, FakeEndpoint("ws://other", 0.2))
+
+        def lookup(instance):
+            if instance.url == "ws://stalled":
+                time.sleep(1)
+            return instance.url
+
+        rpc = stalled.connect().rpc
+        start = time.time()
+        self.assertEqual(pool.call(lookup), "ws://other")
+        self.assertLess(time.time() - start, 1)
+        self.assertFalse(stalled.isHealthy())
+        # the connection is closed once the lookup returns, not under it
+        self.assertTrue(stalled.stalled)
+        self.assertFalse(rpc.closed)
+
+        time.sleep(1.2)
+        self.assertFalse(stalled.stalled)
+        self.assertTrue(rpc.closed)
+        self.assertEqual(pool.pending, 0)
+
+    def testSaturatedPoolFailsFast(self):
+        pool = getPool(FakeEndpoint("ws://stalled", 0.1), FakeEndpoint("ws://other", 0.2))
+
+        def lookup(instance):
+            if instance.url == "ws://stalled":
+                time.sleep(1)
+            return instance.url
+
+        with mock.patch.dict(POOL_CONFIG, {"max_workers": 1}):
+            # the only worker is occupied by the abandoned lookup
+            start = time.time()
+            self.assertRaises(Exception, pool.call, lookup)
+            self.assertLess(time.time() - start, 1)
+            self.assertFalse(pool.endpoints[1].lock.locked())
+
+            time.sleep(1.2)
+            self.assertEqual(pool.call(lookup), "ws://other")
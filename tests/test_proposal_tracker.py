@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from peerplaysbase.operationids import operations
+
+from bos_mint.shared_cache import SharedCache, LocalBackend
+from bos_mint.proposal_tracker import ProposalTracker, OPEN_PROPOSALS
+
+
+def getProposalCreate(operationName, expiration="2018-01-02T00:00:00"):
+    return [operations["proposal_create"], {
+        "expiration_time": expiration,
+        "proposed_ops": [{"op": [operations[operationName], {"event_id": "1.22.1"}]}]
+    }]
+
+
+def getBlock(timestamp, *operationsAndResults):
+    return {
+        "timestamp": timestamp,
+        "transactions": [{
+            "operations": [x[0] for x in operationsAndResults],
+            "operation_results": [[1, x[1]] for x in operationsAndResults]
+        }]
+    }
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(SharedCache, "backend", LocalBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testNotReconciled(self):
+        ProposalTracker().applyBlock(getBlock(
+            "2018-01-01T00:00:00", (getProposalCreate("event_update"), "1.10.1")))
+
+        self.assertIsNone(SharedCache().get(OPEN_PROPOSALS))
+
+    def testAdd(self):
+        SharedCache().set(OPEN_PROPOSALS, {})
+        ProposalTracker().applyBlock(getBlock(
+            "2018-01-01T00:00:00",
+            (getProposalCreate("event_update"), "1.10.1"),
+            (getProposalCreate("transfer"), "1.10.2")))
+
+        # proposals outside of the sport hierarchy are not tracked
+        self.assertEqual(SharedCache().get(OPEN_PROPOSALS), {"1.10.1": "2018-01-02T00:00:00"})
+
+    def testExpire(self):
+        SharedCache().set(OPEN_PROPOSALS, {
+            "1.10.1": "2018-01-01T00:00:00",
+            "1.10.2": "2018-01-03T00:00:00"
+        })
+        ProposalTracker().applyBlock(getBlock("2018-01-02T00:00:00"))
+
+        self.assertEqual(SharedCache().get(OPEN_PROPOSALS), {"1.10.2": "2018-01-03T00:00:00"})
+
+    def testDelete(self):
+        SharedCache().set(OPEN_PROPOSALS, {"1.10.1": "2018-01-03T00:00:00"})
+        ProposalTracker().applyBlock(getBlock(
+            "2018-01-02T00:00:00",
+            ([operations["proposal_delete"], {"proposal": "1.10.1"}], None)))
+
+        self.assertEqual(SharedCache().get(OPEN_PROPOSALS), {})
+
+    def testReconcileUsesTheSameFilter(self):
+        proposals = [
+            {"id": "1.10.1", "expiration_time": "2018-01-02T00:00:00", "proposed_transaction": {
+                "operations": [[operations["event_update"], {"event_id": "1.22.1"}]]}},
+            {"id": "1.10.2", "expiration_time": "2018-01-02T00:00:00", "proposed_transaction": {
+                "operations": [[operations["transfer"], {}]]}}
+        ]
+        ProposalTracker().reconcile(proposals)
+
+        self.assertEqual(SharedCache().get(OPEN_PROPOSALS), {"1.10.1": "2018-01-02T00:00:00"})
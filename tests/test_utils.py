@@ -0,0 +1,37 @@
+import unittest
+
+from bos_mint.utils import TYPE_WRAPPER, getSortKey
+
+OBJECTS = [
+    {"id": "1.22.1", "name": [["de", "B"], ["en", "A"]], "description": [["en", "A"]],
+     "start_time": "2018-01-02T00:00:00", "event_group_id": "1.21.1"},
+    {"id": "1.22.2", "name": None, "description": [["en", "C"]],
+     "start_time": "2018-01-01T00:00:00", "event_group_id": "1.21.1"},
+    {"id": "1.22.3", "name": [["de", "D"]], "description": None,
+     "start_time": None, "event_group_id": "1.21.1"},
+    {"id": "1.22.4", "name": None, "description": None,
+     "start_time": None, "event_group_id": "1.21.1"},
+    {"id": "1.22.5", "name": "E", "description": "F",
+     "pendingOperationId": "0.0.1", "event_group_id": "1.21.1"},
+]
+
+
+class Test(unittest.TestCase):
+
+    def testSortKeyMatchesToString(self):
+        for typeName, wrapperClass in TYPE_WRAPPER.items():
+            wrapped = [wrapperClass(**dict(x)) for x in OBJECTS]
+
+            self.assertEqual(
+                [getSortKey(dict(x), typeName) for x in OBJECTS],
+                [x["toString"] for x in wrapped],
+                typeName)
+            self.assertEqual(
+                [x["id"] for x in sorted(OBJECTS, key=lambda x: getSortKey(x, typeName))],
+                [x["id"] for x in sorted(wrapped, key=lambda x: x["toString"])],
+                typeName)
+
+    def testSortKeyOfWrappedObject(self):
+        wrapped = TYPE_WRAPPER["event"](**dict(OBJECTS[0]))
+
+        self.assertEqual(getSortKey(wrapped, "event"), wrapped["toString"])
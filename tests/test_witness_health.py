@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+
+from bos_mint import app, db, Config
+from bos_mint.witness_health import WitnessHealth, parseBeaconResponse, VERSION_PACKAGES
+
+
+def getResponse(ok, failed=0, running=True):
+    return {
+        "queue": {"status": {"default": {"count": ok}, "failed": {"count": failed}}},
+        "background": {"scheduler": {"running": running}},
+        "versions": {x: "1.0" for x in VERSION_PACKAGES}
+    }
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the tests must not touch the configured database
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite://"
+
+    def setUp(self):
+        context = app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        db.create_all()
+        self.addCleanup(db.drop_all)
+        self.addCleanup(db.session.remove)
+
+        patcher = mock.patch.object(Config, "get", side_effect=lambda *args: args[-1])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, responses):
+        for index, response in enumerate(responses):
+            WitnessHealth().record({"init0": {"response": response, "time": index}})
+
+    def testParse(self):
+        self.assertEqual(parseBeaconResponse(getResponse(3, 1, False)), {
+            "ok": 3, "failed": 1, "scheduler": False,
+            "version": "/".join(["1.0"] * len(VERSION_PACKAGES)), "error": None
+        })
+
+    def testParseErrors(self):
+        sample = parseBeaconResponse("Errored, no response within 15s")
+        self.assertEqual(sample["error"], "Errored, no response within 15s")
+        self.assertIsNone(sample["ok"])
+
+        sample = parseBeaconResponse({"queue": {}})
+        self.assertTrue(sample["error"].startswith("Unexpected beacon response"))
+        self.assertIsNone(sample["version"])
+
+        sample = parseBeaconResponse(None)
+        self.assertTrue(sample["error"].startswith("Unexpected beacon response"))
+
+    def testTrendWithoutDownsampling(self):
+        self.record([getResponse(1), getResponse(2)])
+
+        trend = WitnessHealth().getTrend("init0", points=60)
+        self.assertEqual([x["ok"] for x in trend], [1, 2])
+        self.assertEqual([x["time"] for x in trend], [0, 1])
+
+    def testTrendIsDownsampled(self):
+        self.record([
+            getResponse(1, 0), getResponse(3, 2), "Errored, timeout",
+            getResponse(5, 4, False), getResponse(7, 6), getResponse(9, 8)
+        ])
+
+        trend = WitnessHealth().getTrend("init0", points=2)
+        self.assertEqual(len(trend), 2)
+        # errored samples are not part of the averages
+        self.assertEqual([x["ok"] for x in trend], [2, 7])
+        self.assertEqual([x["failed"] for x in trend], [1, 6])
+        self.assertEqual([x["errors"] for x in trend], [1, 0])
+        # the latest sample of a bucket is taken
+        self.assertEqual([x["time"] for x in trend], [2, 5])
+        self.assertEqual([x["scheduler"] for x in trend], [None, True])
+
+    def testTrendWithoutPoints(self):
+        self.record([getResponse(1), getResponse(3)])
+
+        # all samples end up in a single bucket
+        for points in [0, -1]:
+            self.assertEqual([x["ok"] for x in WitnessHealth().getTrend("init0", points=points)], [2])
+
+    def testTrendSince(self):
+        self.record([getResponse(1), getResponse(2), getResponse(3)])
+
+        self.assertEqual([x["ok"] for x in WitnessHealth().getTrend("init0", since=1)], [2, 3])
+        self.assertEqual(WitnessHealth().getTrend("unknown"), [])